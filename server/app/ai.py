@@ -1,8 +1,11 @@
 import os
+import asyncio
+import time
 import instructor
-from groq import Groq
+from groq import Groq, AsyncGroq
+from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List
 from app.utils import flatten_menu_data
 from pathlib import Path
 import json
@@ -10,6 +13,8 @@ from dotenv import load_dotenv
 from enum import Enum
 from app.prepare import prepare_solver_data
 from app.query import push_into_db
+from app.llm_cache import get_llm_cache, remap_offerings
+from app.ratelimit import RateLimiter, estimate_tokens
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -27,19 +32,25 @@ class VirtualMeal(BaseModel):
 class StationMenu(BaseModel):
     offerings: List[VirtualMeal]
 
-# 2. Setup Client
-groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-client = instructor.from_groq(
-    groq_client,
-    mode=instructor.Mode.JSON
-)
-# client = instructor.from_provider(
-#     "groq/openai/gpt-oss-120b",
-#     mode=instructor.Mode.MD_JSON
-# )
+class StationBatch(BaseModel):
+    stations: Dict[str, StationMenu]  # keyed by the station id given in the prompt
 
-def group_station_items(station_name: str, item_list: List[str]):
-    SYSTEM_PROMPT = """
+LLM_MODEL = "llama-3.3-70b-versatile"
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))  # seconds per call
+LLM_MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", 4))
+LLM_RETRY_WAIT = float(os.environ.get("LLM_RETRY_WAIT", 1))  # seconds, the base of the jittered exponential backoff
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+# Single-station requests whose offerings don't match the scraped items are asked again this many times in total
+LLM_VALIDATION_ATTEMPTS = int(os.environ.get("LLM_VALIDATION_ATTEMPTS", 2))
+# Batched mode packs several stations into one request to amortize the few-shot prompt.
+LLM_BATCH = os.environ.get("LLM_BATCH", "1") == "1"
+LLM_BATCH_MAX_TOKENS = int(os.environ.get("LLM_BATCH_MAX_TOKENS", 6000))  # prompt + expected completion
+LLM_BATCH_MAX_STATIONS = int(os.environ.get("LLM_BATCH_MAX_STATIONS", 8))
+
+# Bump whenever the prompts or schema change so stale cached groupings are ignored.
+PROMPT_VERSION = "v1"
+
+SYSTEM_RULES = """
       You are a Culinary Data Architect. Structure raw food lists into "Meal Bundles".
 
       RULES:
@@ -50,7 +61,9 @@ def group_station_items(station_name: str, item_list: List[str]):
 
       2. **Output format**: Valid JSON only.
 
-      OUTPUT SCHEMA:
+"""
+
+SYSTEM_PROMPT = SYSTEM_RULES + """      OUTPUT SCHEMA:
       {
         "station_name": "String",
         "offerings": [
@@ -64,92 +77,290 @@ def group_station_items(station_name: str, item_list: List[str]):
       }
     """
 
-    USER_PROMPT = f"""
+BATCH_SYSTEM_PROMPT = SYSTEM_RULES + """      OUTPUT SCHEMA:
+      {
+        "stations": {
+          "<station id>": {
+            "offerings": [
+              {
+                "name": "String",
+                "items": ["String", "String"],
+                "service_style": "bundle" | "self_serve",
+                "reasoning": "String"
+              }
+            ]
+          }
+        }
+      }
+
+      Group every station independently and return exactly one entry per station id.
+    """
+
+EXAMPLES_PROMPT = """
       EXAMPLES:
 
       Input: "Signature Maize" -> ["Pork Roast", "Rice", "Avocado", "Corn"]
       Output:
-      {{
+      {
         "station_name": "Signature Maize",
         "offerings": [
-          {{
+          {
             "name": "Pork Roast Plate",
             "items": ["Pork Roast", "Rice", "Avocado", "Corn"],
             "service_style": "bundle",
             "reasoning": "Main dish with standard sides."
-          }}
+          }
         ]
-      }}
+      }
 
       Input: "Toast Bar" -> ['Eggs', 'Bacon', 'Tots']
       Output:
-      {{
+      {
         "station_name": "Toast Bar",
         "offerings": [
-          {{ "name": "Side of Eggs", "items": ["Eggs"], "service_style": "self_serve", "reasoning": "Component" }},
-          {{ "name": "Side of Bacon", "items": ["Bacon"], "service_style": "self_serve", "reasoning": "Component" }},
-          {{ "name": "Side of Tots", "items": ["Tots"], "service_style": "self_serve", "reasoning": "Component" }},
-          {{ "name": "Classic Breakfast", "items": ["Eggs", "Bacon", "Tots"], "service_style": "bundle", "reasoning": "Standard Combo" }}
+          { "name": "Side of Eggs", "items": ["Eggs"], "service_style": "self_serve", "reasoning": "Component" },
+          { "name": "Side of Bacon", "items": ["Bacon"], "service_style": "self_serve", "reasoning": "Component" },
+          { "name": "Side of Tots", "items": ["Tots"], "service_style": "self_serve", "reasoning": "Component" },
+          { "name": "Classic Breakfast", "items": ["Eggs", "Bacon", "Tots"], "service_style": "bundle", "reasoning": "Standard Combo" }
         ]
-      }}
+      }
 
       Input: "Kings Grill" -> ['Burger', 'Fish', 'Fries']
       Output:
-      {{
+      {
         "station_name": "Kings Grill",
         "offerings": [
-          {{ "name": "Burger Combo", "items": ["Burger", "Fries"], "service_style": "bundle", "reasoning": "Classic pairing" }},
-          {{ "name": "Fish & Chips", "items": ["Fish", "Fries"], "service_style": "bundle", "reasoning": "Alternative Main" }}
+          { "name": "Burger Combo", "items": ["Burger", "Fries"], "service_style": "bundle", "reasoning": "Classic pairing" },
+          { "name": "Fish & Chips", "items": ["Fish", "Fries"], "service_style": "bundle", "reasoning": "Alternative Main" }
         ]
-      }}
+      }
+
+"""
 
-      TASK:
+def build_user_prompt(station_name: str, item_list: List[str]):
+    return EXAMPLES_PROMPT + f"""      TASK:
       Input: Station "{station_name}" -> {item_list}
       Output:
     """
 
+def build_batch_user_prompt(batch):
+    """
+    Builds the user prompt for several stations at once.
+    Args:
+        batch (list): [(station_id, station_name, [item names]), ...]
+    """
+    tasks = "".join(
+        f'      Input: Station id "{station_id}", Station "{station_name}" -> {item_list}\n'
+        for station_id, station_name, item_list in batch
+    )
+    return EXAMPLES_PROMPT + f"""      TASK:
+{tasks}      Output:
+    """
+
+# 2. Setup Client
+groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+client = instructor.from_groq(
+    groq_client,
+    mode=instructor.Mode.JSON
+)
+# Retries are handled by tenacity in call_llm_async, so the SDK's own are disabled (and instructor's, per call).
+# GROQ_BASE_URL can point both clients at a local stand-in server.
+async_client = instructor.from_groq(
+    AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=0),
+    mode=instructor.Mode.JSON
+)
+# client = instructor.from_provider(
+#     "groq/openai/gpt-oss-120b",
+#     mode=instructor.Mode.MD_JSON
+# )
+
+def group_station_items(station_name: str, item_list: List[str]):
+    llm_cache = get_llm_cache()
+    cached = llm_cache.get(station_name, item_list, PROMPT_VERSION)
+    if cached is not None:
+        print(f"Cache hit for station: {station_name}")
+        return StationMenu(offerings=cached)
 
     # 3. The Call
     resp = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
+        model=LLM_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": USER_PROMPT},
+            {"role": "user", "content": build_user_prompt(station_name, item_list)},
         ],
         response_model=StationMenu,
     )
 
+    llm_cache.set(station_name, item_list, PROMPT_VERSION, resp.model_dump(mode="json")["offerings"])
     return resp
 
-def analyze_menu_for_ai(json_data):
+async def call_llm_async(system_prompt: str, user_prompt: str, response_model, limiter: RateLimiter, completion_tokens=512, on_call=None):
+    """
+    Rate limited async LLM call, retried with jittered backoff and bounded by LLM_TIMEOUT per attempt.
+    If given, `on_call` receives {"seconds", "attempts", <token usage>} once the call succeeds or gives up
+    ("error" is set then); seconds include rate limit waits and retries.
+    """
+    start = time.perf_counter()
+    call = {"attempts": 0}
+    try:
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(LLM_MAX_ATTEMPTS),
+            wait=wait_random_exponential(multiplier=LLM_RETRY_WAIT, max=30),
+            reraise=True,
+        ):
+            with attempt:
+                call["attempts"] += 1
+                await limiter.acquire(estimate_tokens(system_prompt, user_prompt, completion_tokens=completion_tokens))
+                resp, completion = await asyncio.wait_for(
+                    async_client.chat.completions.create_with_completion(
+                        model=LLM_MODEL,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt},
+                        ],
+                        response_model=response_model,
+                        max_retries=1,  # one request per attempt, so every request is rate limited and backed off
+                    ),
+                    timeout=LLM_TIMEOUT,
+                )
+                usage = getattr(completion, "usage", None)
+                if usage is not None:
+                    call.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens, total_tokens=usage.total_tokens)
+                return resp
+    except Exception as e:
+        call["error"] = repr(e)
+        raise
+    finally:
+        if on_call is not None:
+            on_call({"seconds": time.perf_counter() - start, **call})
+
+async def group_station_items_async(station_name: str, item_list: List[str], limiter: RateLimiter, use_cache=True, on_llm_call=None):
+    """
+    Async version of group_station_items. `on_llm_call` is passed to call_llm_async, tagged with the station count.
+    Results are validated and remapped to the scraped item names before they are cached, like batched results;
+    a station that never gets a usable result raises ValueError.
+    """
+    llm_cache = get_llm_cache()
+    if use_cache:
+        cached = llm_cache.get(station_name, item_list, PROMPT_VERSION)
+        if cached is not None:
+            print(f"Cache hit for station: {station_name}")
+            return StationMenu(offerings=cached)
+
+    for _ in range(LLM_VALIDATION_ATTEMPTS):
+        resp = await call_llm_async(
+            SYSTEM_PROMPT, build_user_prompt(station_name, item_list), StationMenu, limiter,
+            on_call=on_llm_call and (lambda call: on_llm_call({"stations": 1, **call})),
+        )
+        offerings = validate_station_menu(resp, item_list)
+        if offerings is not None:
+            llm_cache.set(station_name, item_list, PROMPT_VERSION, offerings)
+            return StationMenu(offerings=offerings)
+        print(f"Result for station {station_name} failed validation.")
+    raise ValueError(f"No valid grouping for station {station_name} after {LLM_VALIDATION_ATTEMPTS} attempts")
+
+def estimate_completion_tokens(item_list):
+    # Roughly one offering line per item plus a couple of suggested bundles
+    return 80 + 60 * len(item_list)
+
+def make_batches(requests, max_tokens=LLM_BATCH_MAX_TOKENS, max_stations=LLM_BATCH_MAX_STATIONS):
+    """
+    Greedily packs station requests into batches that fit the model's context budget.
+    Args:
+        requests (list): [(key, station_name, [item names]), ...]
+    Returns:
+        list: batches of requests, each with at most `max_stations` stations.
+    """
+    base_tokens = estimate_tokens(BATCH_SYSTEM_PROMPT, EXAMPLES_PROMPT, completion_tokens=0)
+    batches = []
+    current, current_tokens = [], base_tokens
+    for request in requests:
+        _, station_name, item_list = request
+        request_tokens = estimate_tokens(f"{station_name} {item_list}", completion_tokens=estimate_completion_tokens(item_list))
+        if current and (current_tokens + request_tokens > max_tokens or len(current) >= max_stations):
+            batches.append(current)
+            current, current_tokens = [], base_tokens
+        current.append(request)
+        current_tokens += request_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def validate_station_menu(station_menu, item_list):
+    """
+    Checks a station result (batched or single) against the station's real items.
+    Returns the offerings with item names matched to the scrape, or None if the result is unusable.
+    """
+    if station_menu is None or not station_menu.offerings:
+        return None
+    offerings = station_menu.model_dump(mode="json")["offerings"]
+    remapped = remap_offerings(offerings, item_list)
+    if len(remapped) != len(offerings) or any(len(r["items"]) != len(o["items"]) for r, o in zip(remapped, offerings)):
+        return None
+    return remapped
+
+async def group_station_batch_async(batch, limiter: RateLimiter, on_llm_call=None):
+    """
+    Groups several stations with a single LLM request.
+    Args:
+        batch (list): [(key, station_name, [item names]), ...]
+    Returns:
+        dict: { key: StationMenu } for every station that passed validation.
+    """
+    station_ids = {str(i + 1): request for i, request in enumerate(batch)}
+    user_prompt = build_batch_user_prompt(
+        [(station_id, station_name, item_list) for station_id, (_, station_name, item_list) in station_ids.items()]
+    )
+    completion_tokens = sum(estimate_completion_tokens(item_list) for _, _, item_list in batch)
+    try:
+        resp = await call_llm_async(
+            BATCH_SYSTEM_PROMPT, user_prompt, StationBatch, limiter, completion_tokens,
+            on_call=on_llm_call and (lambda call: on_llm_call({"stations": len(batch), **call})),
+        )
+    except Exception as e:
+        print(f"Batch of {len(batch)} stations failed ({type(e).__name__}), falling back to single-station calls.")
+        return {}
+
+    llm_cache = get_llm_cache()
+    results = {}
+    for station_id, (key, station_name, item_list) in station_ids.items():
+        offerings = validate_station_menu(resp.stations.get(station_id), item_list)
+        if offerings is None:
+            print(f"Batched result for station {station_name} failed validation.")
+            continue
+        llm_cache.set(station_name, item_list, PROMPT_VERSION, offerings)
+        results[key] = StationMenu(offerings=offerings)
+    return results
+
+def get_static_offerings(station_name, components):
+    """
+    Returns the offerings for stations that don't need the LLM (ignored stations and
+    single-item stations), or None if the station should be grouped by the model.
+    """
     stations_to_ignore = ['Soup', 'MBakery', 'Deli']
-    print(json_data.keys())
-    key, components = next(iter(json_data.items()))
 
-    if key in stations_to_ignore:
+    if station_name in stations_to_ignore:
         offerings = []
-        if key == 'Soup':
-          for items in json_data.values():
-              for item in items:
-                  offerings.append(
-                    {
-                        "name": item,
-                        "items": [item],
-                        "service_style": "self-serve",
-                        "reasoning": ""
-                    }
-                  )
-        elif key == 'MBakery':
-            for items in json_data.values():
-                for item in items:
-                    offerings.append(
-                      {
-                          "name": item,
-                          "items": [item],
-                          "service_style": "dessert",
-                          "reasoning": ""
-                      }
-                    )
+        if station_name == 'Soup':
+            for item in components:
+                offerings.append(
+                  {
+                      "name": item,
+                      "items": [item],
+                      "service_style": "self-serve",
+                      "reasoning": ""
+                  }
+                )
+        elif station_name == 'MBakery':
+            for item in components:
+                offerings.append(
+                  {
+                      "name": item,
+                      "items": [item],
+                      "service_style": "dessert",
+                      "reasoning": ""
+                  }
+                )
         return { "offerings": offerings }
 
     if len(components) <= 1:
@@ -164,12 +375,81 @@ def analyze_menu_for_ai(json_data):
               }
             )
         return { "offerings": offerings }
-    
+
+    return None
+
+def analyze_menu_for_ai(json_data):
+    print(json_data.keys())
+    key, components = next(iter(json_data.items()))
+
+    static_offerings = get_static_offerings(key, components)
+    if static_offerings is not None:
+        return static_offerings
+
     for station, items in json_data.items():
         print(f"Analyzing station: {station} with {len(items)} items.")
         analysis = group_station_items(station, items)
     return analysis.model_dump()
 
+async def analyze_stations_async(stations, limiter=None, batch=LLM_BATCH, return_exceptions=False, on_llm_call=None):
+    """
+    Groups many stations concurrently, sharing one rate limiter.
+    Args:
+        stations (dict): { key: (station_name, [item names]) }
+        limiter (RateLimiter): shared RPM/TPM limiter; a fresh one is created if omitted.
+        batch (bool): pack several stations into each LLM request; stations whose batched
+            result fails validation are retried with single-station calls.
+        return_exceptions (bool): return a failed station's exception as its result instead
+            of raising it, so the other stations still complete.
+        on_llm_call (callable): receives a dict per LLM request made (stations, seconds, attempts, token usage).
+    Returns:
+        dict: { key: {"offerings": [...]} }, same shape as analyze_menu_for_ai.
+    """
+    limiter = limiter or RateLimiter()
+    semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    llm_cache = get_llm_cache()
+
+    results = {}
+    pending = []
+    for key, (station_name, items) in stations.items():
+        static_offerings = get_static_offerings(station_name, items)
+        if static_offerings is not None:
+            results[key] = static_offerings
+            continue
+        cached = llm_cache.get(station_name, items, PROMPT_VERSION)
+        if cached is not None:
+            print(f"Cache hit for station: {station_name}")
+            results[key] = StationMenu(offerings=cached).model_dump()
+            continue
+        pending.append((key, station_name, items))
+
+    if batch and len(pending) > 1:
+        async def analyze_batch(station_batch):
+            async with semaphore:
+                print(f"Analyzing {len(station_batch)} stations in one batch.")
+                return await group_station_batch_async(station_batch, limiter, on_llm_call)
+
+        for batch_results in await asyncio.gather(*(analyze_batch(b) for b in make_batches(pending))):
+            for key, analysis in batch_results.items():
+                results[key] = analysis.model_dump()
+        pending = [request for request in pending if request[0] not in results]
+
+    async def analyze(key, station_name, items):
+        async with semaphore:
+            print(f"Analyzing station: {station_name} with {len(items)} items.")
+            try:
+                analysis = await group_station_items_async(station_name, items, limiter, use_cache=False, on_llm_call=on_llm_call)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return key, e
+        return key, analysis.model_dump()
+
+    for key, analysis in await asyncio.gather(*(analyze(*request) for request in pending)):
+        results[key] = analysis
+
+    return {key: results[key] for key in stations}
+
 if __name__ == "__main__":
     for file_path in Path('/Users/wenxi/Documents/CodingProjects/dining-app/server/app/data').glob("*.json"):
         with open(file_path, "r") as f:
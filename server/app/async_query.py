@@ -0,0 +1,248 @@
+import asyncio
+import os
+import time
+import httpx
+from app.utils import get_today_est
+from app.store import get_menu_store
+from app.snapshot import schedule_snapshot_refresh
+from app.metrics import MENU_CACHE
+from app.query import URL, KEY, MENU_STORE_ONLY, MENU_STORE_TTL, get_fresh_snapshot, get_menu_reader
+
+# Connection pool of the async PostgREST client (per API worker)
+SUPABASE_POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", 20))
+SUPABASE_KEEPALIVE = int(os.environ.get("SUPABASE_KEEPALIVE", 10))  # idle connections kept open
+SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_KEEPALIVE_EXPIRY", 30))
+SUPABASE_HTTP2 = os.environ.get("SUPABASE_HTTP2", "1") == "1"  # multiplex requests over one connection (TLS only)
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 5))  # seconds, per call
+SUPABASE_CONNECT_TIMEOUT = float(os.environ.get("SUPABASE_CONNECT_TIMEOUT", 3))
+
+_client = None
+_client_loop = None
+
+def get_async_client():
+    """
+    Returns the pooled PostgREST client of the running event loop, creating it on first use.
+    httpx clients are tied to the loop they were first used on, so a new loop gets a new client.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=f"{URL}/rest/v1",
+            headers={"apikey": KEY, "Authorization": f"Bearer {KEY}"},
+            http2=SUPABASE_HTTP2,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_SIZE,
+                max_keepalive_connections=SUPABASE_KEEPALIVE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+        )
+        _client_loop = loop
+    return _client
+
+async def close_async_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client, _client_loop = None, None
+
+def array_literal(values):
+    """
+    Formats values as a Postgres array literal for PostgREST's cs (contains) filter, e.g. {"Gluten Free"}.
+    """
+    quoted = ['"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values]
+    return "{" + ",".join(quoted) + "}"
+
+async def select(table, filters=(), columns="*", timeout=None):
+    """
+    Runs a PostgREST select.
+
+    Args:
+        table (str): Table or view name.
+        filters (list): (column, "operator.value") pairs, e.g. [("date", "eq.2025-01-31")].
+        timeout (float): Overrides SUPABASE_TIMEOUT for this call.
+    Returns:
+        list: The selected rows.
+    """
+    kwargs = {} if timeout is None else {"timeout": timeout}
+    response = await get_async_client().get(f"/{table}", params=[("select", columns), *filters], **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+async def get_active_menu_version(dining_hall_id, menu_date):
+    """
+    Returns the live menu version for a hall and date, or None if the hall has no published version.
+    """
+    rows = await select("menu_versions", [("dining_hall_id", f"eq.{dining_hall_id}"), ("date", f"eq.{menu_date}")], columns="version")
+    return rows[0]["version"] if rows else None
+
+async def select_menu_rows(dining_hall_id, menu_date, menu_version):
+    """
+    Returns the menu rows of a hall and date, only those of `menu_version` if given.
+    """
+    filters = [("date", f"eq.{menu_date}"), ("dining_hall_id", f"eq.{dining_hall_id}")]
+    if menu_version:
+        filters.append(("menu_version", f"eq.{menu_version}"))
+    return await select("menu_items", filters)
+
+_syncs_in_flight = {}  # (hall id, date) -> task, so concurrent requests share one reload
+
+async def sync_hall_menu(dining_hall_id, menu_date):
+    """
+    Async counterpart of query.sync_hall_menu: makes sure the live menu of a hall for a date
+    can be served locally, re-checking Supabase after MENU_STORE_TTL seconds.
+
+    Returns:
+        The reader to serve the menu from (the menu snapshot or the local store), or None if neither can.
+    """
+    snapshot = get_fresh_snapshot(dining_hall_id, menu_date)
+    if snapshot is not None:
+        return snapshot
+
+    store = get_menu_store()
+    loaded = store.get_loaded_menu(dining_hall_id, menu_date)
+    if MENU_STORE_ONLY:
+        MENU_CACHE.inc(result="hit" if loaded else "miss")
+        return get_menu_reader(dining_hall_id, menu_date, loaded["version"]) if loaded else None
+    if loaded and time.time() - loaded["loaded_at"] < MENU_STORE_TTL:
+        MENU_CACHE.inc(result="hit")
+        return get_menu_reader(dining_hall_id, menu_date, loaded["version"])
+
+    key = (dining_hall_id, menu_date)
+    task = _syncs_in_flight.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(_reload_hall_menu(store, dining_hall_id, menu_date, loaded))
+        _syncs_in_flight[key] = task
+        task.add_done_callback(lambda _: _syncs_in_flight.pop(key, None))
+    return await asyncio.shield(task)
+
+async def _reload_hall_menu(store, dining_hall_id, menu_date, loaded):
+    try:
+        menu_version = await get_active_menu_version(dining_hall_id, menu_date)
+        if loaded and menu_version is not None and menu_version == loaded["version"]:
+            store.touch_menu(dining_hall_id, menu_date)
+            schedule_snapshot_refresh(store)  # carries the new loaded_at into the snapshot
+            MENU_CACHE.inc(result="revalidated")
+            return get_menu_reader(dining_hall_id, menu_date, loaded["version"])
+
+        MENU_CACHE.inc(result="miss")
+        rows = await select_menu_rows(dining_hall_id, menu_date, menu_version)
+        if not rows and menu_version:
+            # The version was superseded between the two reads; follow the pointer once more
+            menu_version = await get_active_menu_version(dining_hall_id, menu_date)
+            rows = await select_menu_rows(dining_hall_id, menu_date, menu_version)
+            if not rows and menu_version:
+                raise LookupError(f"menu version {menu_version} has no rows")
+        await asyncio.to_thread(store.replace_hall_menu, rows, dining_hall_id, menu_date, menu_version)
+        schedule_snapshot_refresh(store)
+        return store
+    except Exception as e:
+        print(f"An error occurred while syncing the local menu store: {e}")
+        if loaded is None:
+            return None
+        MENU_CACHE.inc(result="stale")
+        return get_menu_reader(dining_hall_id, menu_date, loaded["version"])
+
+async def fetch_menu_items(dining_hall_id = None, meal_period = None, traits=[], allergens=[], menu_date=None):
+    """
+    Async counterpart of query.fetch_menu_items.
+    """
+    if dining_hall_id is None or meal_period is None:
+        return []
+
+    today_date_est = menu_date or get_today_est()
+
+    reader = await sync_hall_menu(dining_hall_id, today_date_est)
+    if reader is not None:
+        return reader.fetch_menu_items(dining_hall_id, meal_period, today_date_est, traits, allergens)
+
+    filters = [
+        ("date", f"eq.{today_date_est}"),
+        ("dining_hall_id", f"eq.{dining_hall_id}"),
+        ("meal_period", f"eq.{meal_period.lower()}"),
+    ]
+    filters += [("traits", f"cs.{array_literal([trait])}") for trait in traits]
+    filters += [("allergens", f"not.cs.{array_literal([allergen])}") for allergen in allergens]
+
+    try:
+        menu_version = await get_active_menu_version(dining_hall_id, today_date_est)
+        if menu_version:
+            filters.append(("menu_version", f"eq.{menu_version}"))
+        return await select("menu_items", filters)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return []
+
+async def get_menu_version(dining_hall_id, menu_date):
+    """
+    Returns the version of the hall/date menu the API currently serves (syncing it first if stale),
+    or None if it is unknown. Only menu metadata is read, not the items.
+    """
+    reader = await sync_hall_menu(dining_hall_id, menu_date)
+    loaded = reader.get_loaded_menu(dining_hall_id, menu_date) if reader is not None else None
+    return loaded["version"] if loaded else None
+
+async def get_dining_halls_digest():
+    """
+    Returns a digest of the dining halls the API currently serves (refreshing them first if stale), or None.
+    """
+    store = get_menu_store()
+    digest, loaded_at = store.get_dining_halls_digest()
+    if loaded_at is None or (not MENU_STORE_ONLY and time.time() - loaded_at >= MENU_STORE_TTL):
+        await get_all_dining_halls_info()
+        digest, _ = store.get_dining_halls_digest()
+    return digest
+
+async def get_all_dining_halls_info():
+    """
+    Async counterpart of query.get_all_dining_halls_info.
+    """
+    store = get_menu_store()
+    halls, loaded_at = store.get_dining_halls()
+    if loaded_at is not None and (MENU_STORE_ONLY or time.time() - loaded_at < MENU_STORE_TTL):
+        return halls
+
+    try:
+        rows = await select("daily_hall_status")
+        await asyncio.to_thread(store.replace_dining_halls, rows)
+        return rows
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return halls
+
+async def get_default_menu_document(dining_hall_id, meal_period, menu_date=None):
+    """
+    Returns the pre-serialized default menu (JSON bytes) materialized when the menu was stored,
+    or None if the local store can't serve this hall/date.
+    """
+    today_date_est = menu_date or get_today_est()
+    reader = await sync_hall_menu(dining_hall_id, today_date_est)
+    if reader is None:
+        return None
+    return reader.get_default_menu_document(dining_hall_id, meal_period, today_date_est)
+
+async def get_dining_hall_default_menu(dining_hall_id, meal_period, menu_date=None):
+    """
+    Async counterpart of query.get_dining_hall_default_menu.
+    """
+    today_date_est = menu_date or get_today_est()
+
+    reader = await sync_hall_menu(dining_hall_id, today_date_est)
+    if reader is not None:
+        return reader.get_default_menu(dining_hall_id, meal_period, today_date_est)
+
+    filters = [
+        ("date", f"eq.{today_date_est}"),
+        ("dining_hall_id", f"eq.{dining_hall_id}"),
+        ("meal_period", f"eq.{meal_period}"),
+        ("convenience_score", "eq.1"),
+    ]
+    try:
+        menu_version = await get_active_menu_version(dining_hall_id, today_date_est)
+        if menu_version:
+            filters.append(("menu_version", f"eq.{menu_version}"))
+        return await select("menu_items", filters)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return []
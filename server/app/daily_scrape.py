@@ -1,35 +1,390 @@
-from app.scraper import scrape_dining_hall, get_soup
-from app.utils import flatten_station_items
-from app.ai import analyze_menu_for_ai
+from app.scraper import scrape_dining_hall, get_html, build_menu_url
+from app.utils import flatten_station_items, get_configured_halls, get_today_est
+from app.ai import analyze_stations_async
+from app.ratelimit import RateLimiter
 from app.prepare import prepare_solver_data
-from app.query import push_into_db, get_all_dining_halls_info, delete_from_db
+from app.query import publish_hall_menu, get_all_dining_halls_info
+from app.llm_cache import get_llm_cache
+from app.store import get_menu_store
+from app.snapshot import refresh_snapshot
+from app.pipeline import run_pipeline
+from app.manifest import RunManifest, unit_key, DONE, FAILED
+from app.run_report import RunReport, HISTORY_PATH, load_last_report, append_report, compare_reports
+from bs4 import BeautifulSoup
 from pathlib import Path
+import argparse
+from datetime import date, datetime, timedelta
+import asyncio
+import json
+import os
+import random
 import sys
+import time
+
+OFFLINE_DATA_DIR = Path(__file__).resolve().parent / "offline_data"
+
+# Workers per pipeline stage
+FETCH_CONCURRENCY = int(os.environ.get("SCRAPE_FETCH_CONCURRENCY", 3))
+PARSE_CONCURRENCY = int(os.environ.get("SCRAPE_PARSE_CONCURRENCY", 2))
+AI_CONCURRENCY = int(os.environ.get("SCRAPE_AI_CONCURRENCY", 4))
+PREPARE_CONCURRENCY = int(os.environ.get("SCRAPE_PREPARE_CONCURRENCY", 2))
+PUBLISH_CONCURRENCY = int(os.environ.get("SCRAPE_PUBLISH_CONCURRENCY", 2))
+QUEUE_SIZE = int(os.environ.get("SCRAPE_QUEUE_SIZE", 32))
+SCRAPE_DAYS = int(os.environ.get("SCRAPE_DAYS", 1))  # today plus the following days
+# Backoff between attempts of a failed unit: doubles per failure, jittered, capped
+UNIT_RETRY_DELAY = float(os.environ.get("SCRAPE_RETRY_DELAY", 2))  # seconds
+UNIT_RETRY_MAX_DELAY = float(os.environ.get("SCRAPE_RETRY_MAX_DELAY", 30))
+
+def get_menu_dates(days=1):
+    """
+    Returns ISO dates for today (EST) and the following `days - 1` days.
+    """
+    today = date.fromisoformat(get_today_est())
+    return [(today + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+def get_hall_jobs(offline=False, days=1):
+    """
+    Lists the (hall, menu date) pairs to scrape and where to read each one from.
+    Offline jobs use the configured halls and each one's newest saved page in app/offline_data
+    (the same saved page stands in for every date).
+    """
+    menu_dates = get_menu_dates(days)
+    if not offline:
+        halls = get_all_dining_halls_info()
+        return [
+            {"hall": hall, "menu_date": menu_date, "source": build_menu_url(str(hall['url']), menu_date), "is_local": False}
+            for menu_date in menu_dates for hall in halls
+        ]
+
+    jobs = []
+    for menu_date in menu_dates:
+        for hall in get_configured_halls():
+            file_path = get_offline_page(hall)
+            if file_path is None:
+                print(f"No saved page for {hall['name']}, skipping.")
+                continue
+            jobs.append({"hall": hall, "menu_date": menu_date, "source": str(file_path), "is_local": True})
+    return jobs
+
+def get_offline_page(hall):
+    """
+    Returns the newest saved page of a hall in app/offline_data (named <test_id>_MM_DD_YY.html), or None.
+    A hall gets a single job per date, since its in-progress state and checkpoints are keyed by hall and date.
+    """
+    def saved_on(file_path):
+        try:
+            return datetime.strptime(file_path.stem[len(hall['test_id']) + 1:], "%m_%d_%y").date()
+        except ValueError:
+            return date.min
+    pages = OFFLINE_DATA_DIR.glob(f"{hall['test_id']}_*.html")
+    return max(pages, key=lambda file_path: (saved_on(file_path), file_path.name), default=None)
+
+def make_local_publisher(directory):
+    """
+    Returns a drop-in replacement for publish_hall_menu that writes each hall's rows
+    to <directory>/<date>/<hall id>.json instead of Supabase.
+    """
+    def publish(rows, dining_hall_id, menu_date=None):
+        menu_date = menu_date or get_today_est()
+        out_dir = Path(directory) / menu_date
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with open(out_dir / f"{dining_hall_id}.json", "w") as f:
+            json.dump(rows, f, indent=4)
+        return f"local-{menu_date}"
+    return publish
+
+def make_store_publisher():
+    """
+    Returns a drop-in replacement for publish_hall_menu that only writes the local menu store,
+    so the API can serve the run with MENU_STORE_ONLY=1 and no Supabase.
+    """
+    def publish(rows, dining_hall_id, menu_date=None):
+        menu_date = menu_date or get_today_est()
+        version = f"local-{menu_date}"
+        get_menu_store().replace_hall_menu(rows, dining_hall_id, menu_date, version)
+        return version
+    return publish
+
+def prepare_meal_period(unit):
+    rows = []
+    for station_name, items in unit["stations"].items():
+        print(f"  Station: {station_name} with {len(items)} items.")
+        ai_analysis = unit["analyses"][station_name]
+        rows.extend(prepare_solver_data(items, ai_analysis["offerings"], station_name, unit["meal_period"], unit["hall"]["id"]))
+    return rows
+
+async def retry_backoff(failures):
+    """
+    Waits before the next attempt of a unit that has failed `failures` times in this run.
+    """
+    delay = min(UNIT_RETRY_DELAY * 2 ** (failures - 1), UNIT_RETRY_MAX_DELAY)
+    await asyncio.sleep(delay * random.uniform(0.5, 1))
+
+async def run_unit(manifest, key, fn, checkpoint=True):
+    """
+    Runs one unit of work until it succeeds or runs out of this run's attempts, backing off between attempts.
+    Checkpointed results are reused instead of running `fn` again.
+    Returns:
+        The unit's result, or None if it failed.
+    """
+    if checkpoint:
+        result = manifest.get_result(key)
+        if result is not None:
+            return result
+    failures = 0
+    while manifest.attempts_left(key) > 0:
+        if failures:
+            await retry_backoff(failures)
+        try:
+            result = await fn()
+        except Exception as e:
+            print(f"Unit {key} failed: {e!r}")
+            manifest.record(key, FAILED, error=repr(e))
+            failures += 1
+            continue
+        manifest.record(key, DONE, result=result if checkpoint else None)
+        return result
+    return None
+
+async def run_daily_scrape(hall_jobs, publish=publish_hall_menu, manifest=None, report=None):
+    """
+    Scrapes, groups, prepares and publishes every (hall, menu date) job as a streaming pipeline:
+
+        fetch -> parse -> AI grouping (per meal period) -> prepare -> publish (per hall and date)
+
+    The fetch stage's worker count is the global limit on concurrent page loads across all halls and dates.
+
+    Parsed menus, station groupings and publishes are checkpointed in `manifest`, so a
+    rerun on the same day skips halls that were already published and only redoes the
+    units that failed or never ran. A hall with a meal period that could not be prepared
+    is not published, so its live menu stays untouched until a rerun succeeds. A station
+    that could not be grouped is published as raw items for now; its unit stays failed,
+    and the hall's publish is not checkpointed, so a rerun regroups it and republishes.
+
+    Stage wall times, LLM calls and row counts per hall and date are recorded in `report`.
+
+    Returns:
+        list: One summary dict per published hall.
+    """
+    manifest = manifest or RunManifest(get_today_est())
+    report = report or RunReport(get_today_est())
+    limiter = RateLimiter()
+    halls_in_progress = {}  # (hall id, menu date) -> rows collected so far and meal periods still to come
+
+    async def fetch(job):
+        hall, menu_date = job["hall"], job["menu_date"]
+        if manifest.get_result(unit_key(hall['id'], menu_date, "publish")) is not None:
+            print(f"{hall['name']} ({menu_date}) was already published, skipping.")
+            return None
+        dhall_data = manifest.get_result(unit_key(hall['id'], menu_date, "parse"))
+        if dhall_data is not None:
+            return [{**job, "dhall_data": dhall_data}]
+
+        print(f"Scraping {hall['name']} ({menu_date})...")
+        with report.stage(hall['name'], menu_date, "fetch"):
+            html = await run_unit(
+                manifest, unit_key(hall['id'], menu_date, "fetch"),
+                lambda: asyncio.to_thread(get_html, job["source"], job["is_local"]),
+                checkpoint=False,
+            )
+        return [{**job, "html": html}] if html is not None else None
+
+    async def parse(job):
+        hall, menu_date = job["hall"], job["menu_date"]
+        dhall_data = job.get("dhall_data")
+        if dhall_data is None:
+            with report.stage(hall['name'], menu_date, "parse"):
+                dhall_data = await run_unit(
+                    manifest, unit_key(hall['id'], menu_date, "parse"),
+                    lambda: asyncio.to_thread(
+                        lambda: scrape_dining_hall(BeautifulSoup(job["html"], "html.parser"), url=job["source"], name=str(hall['name']))
+                    ),
+                )
+        if not dhall_data:
+            print(f"No menu found for {hall['name']} ({menu_date}), skipping.")
+            return None
+        halls_in_progress[(hall['id'], menu_date)] = {"rows": [], "remaining": len(dhall_data), "failed": False, "ungrouped": False}
+        return [
+            {"hall": hall, "menu_date": menu_date, "meal_period": meal_period, "stations": stations}
+            for meal_period, stations in dhall_data.items()
+        ]
+
+    async def group(unit):
+        hall, menu_date, meal_period = unit["hall"], unit["menu_date"], unit["meal_period"]
+        print(f"Grouping {len(unit['stations'])} stations for {meal_period} at {hall['name']} ({menu_date})...")
+        with report.stage(hall['name'], menu_date, "group"):
+            analyses = await group_stations(unit)
+        return [{**unit, "analyses": analyses}]
+
+    async def group_stations(unit):
+        hall, menu_date, meal_period = unit["hall"], unit["menu_date"], unit["meal_period"]
+        flattened_stations = flatten_station_items(unit["stations"])
+        station_keys = {station_name: unit_key(hall['id'], menu_date, meal_period, station_name) for station_name in flattened_stations}
+
+        analyses = {}
+        station_requests = {}
+        for station_name, items in flattened_stations.items():
+            checkpoint = manifest.get_result(station_keys[station_name])
+            if checkpoint is not None:
+                analyses[station_name] = checkpoint
+            elif manifest.attempts_left(station_keys[station_name]) > 0:
+                station_requests[station_name] = (station_name, items)
+
+        rounds = 0
+        while station_requests:
+            if rounds:
+                await retry_backoff(rounds)
+            rounds += 1
+            results = await analyze_stations_async(
+                station_requests, limiter, return_exceptions=True,
+                on_llm_call=lambda call: report.add_llm_call(hall['name'], menu_date, {"meal_period": meal_period, **call}),
+            )
+            for station_name, result in results.items():
+                if isinstance(result, Exception):
+                    print(f"Grouping {station_name} failed: {result!r}")
+                    manifest.record(station_keys[station_name], FAILED, error=repr(result))
+                else:
+                    manifest.record(station_keys[station_name], DONE, result=result)
+                    analyses[station_name] = result
+            station_requests = {
+                station_name: request for station_name, request in station_requests.items()
+                if station_name not in analyses and manifest.attempts_left(station_keys[station_name]) > 0
+            }
+
+        # Stations out of attempts are published as raw items (prepare_solver_data's safety net) in
+        # this run only: their units stay failed, so the run reports them and a rerun retries them
+        for station_name in flattened_stations:
+            if station_name not in analyses:
+                print(f"Publishing {station_name} ({meal_period}) at {hall['name']} ({menu_date}) ungrouped.")
+                halls_in_progress[(hall['id'], menu_date)]["ungrouped"] = True
+                analyses[station_name] = {"offerings": []}
+        return analyses
+
+    async def prepare(unit):
+        print(f"Processing {unit['meal_period']} for {unit['hall']['name']} ({unit['menu_date']})...")
+        with report.stage(unit["hall"]['name'], unit["menu_date"], "prepare"):
+            rows = await run_unit(
+                manifest, unit_key(unit["hall"]['id'], unit["menu_date"], unit["meal_period"], "prepare"),
+                lambda: asyncio.to_thread(prepare_meal_period, unit),
+                checkpoint=False,
+            )
+        # rows is None when the meal period failed; publish_hall still has to count it
+        return [{"hall": unit["hall"], "menu_date": unit["menu_date"], "rows": rows}]
+
+    async def publish_hall(unit):
+        hall, menu_date = unit["hall"], unit["menu_date"]
+        state = halls_in_progress[(hall['id'], menu_date)]
+        if unit["rows"] is None:
+            state["failed"] = True
+        else:
+            state["rows"].extend(unit["rows"])
+        state["remaining"] -= 1
+        if state["remaining"] > 0:
+            return None
+
+        # Publish the whole hall at once so readers never see a partial menu
+        del halls_in_progress[(hall['id'], menu_date)]
+        if state["failed"]:
+            print(f"Not publishing {hall['name']} ({menu_date}): a meal period failed to prepare.")
+            return None
+        with report.stage(hall['name'], menu_date, "publish"):
+            version = await run_unit(
+                manifest, unit_key(hall['id'], menu_date, "publish"),
+                lambda: asyncio.to_thread(publish, state["rows"], hall['id'], menu_date),
+                checkpoint=not state["ungrouped"],
+            )
+        if version is None:
+            return None
+        report.add_rows(hall['name'], menu_date, len(state["rows"]))
+        return [{"hall": hall['name'], "menu_date": menu_date, "rows": len(state["rows"]), "version": version}]
+
+    return await run_pipeline(
+        hall_jobs,
+        [
+            (fetch, FETCH_CONCURRENCY),
+            (parse, PARSE_CONCURRENCY),
+            (group, AI_CONCURRENCY),
+            (prepare, PREPARE_CONCURRENCY),
+            (publish_hall, PUBLISH_CONCURRENCY),
+        ],
+        queue_size=QUEUE_SIZE,
+    )
+
+def write_report(run_report, report_path=None, history_path=HISTORY_PATH):
+    """
+    Prints the run's stage timings and LLM usage, compares them with the previous run in the
+    history file, then appends the report to the history (and writes it to `report_path` if given).
+    """
+    print(f"Stage timings (summed over halls, {run_report['wall_seconds']:.1f}s wall):")
+    for stage, total in run_report["stages"].items():
+        print(f"  {stage:8s} {total['seconds']:8.1f}s over {total['count']} units")
+    llm = run_report["llm"]
+    print(
+        f"LLM: {llm['calls']} calls ({llm['failed_calls']} failed), {llm['seconds']:.1f}s, "
+        f"{llm['prompt_tokens']} prompt + {llm['completion_tokens']} completion tokens"
+    )
+
+    previous = load_last_report(history_path)
+    if previous is not None:
+        changes, regressions = compare_reports(run_report, previous)
+        print(f"Compared with the run of {previous['started_at']}:")
+        for change in changes:
+            print(f"  {change}")
+        for regression in regressions:
+            print(f"  REGRESSION: {regression}")
+            if os.environ.get("GITHUB_ACTIONS") == "true":
+                print(f"::warning title=Scrape slower than previous run::{regression}")
+
+    append_report(run_report, history_path)
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(run_report, f, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape dining hall menus for today and the coming days and publish them.")
+    parser.add_argument("--offline", action="store_true", help="Use the configured halls and the saved pages in app/offline_data.")
+    parser.add_argument("--publish-dir", help="Write menus as JSON under this directory instead of publishing to Supabase.")
+    parser.add_argument("--local-store", action="store_true", help="Publish only to the local menu store (see app.store) instead of Supabase.")
+    parser.add_argument("--days", type=int, default=SCRAPE_DAYS, help="Scrape today plus the following days (default: %(default)s).")
+    parser.add_argument("--fresh", action="store_true", help="Ignore today's checkpoints and redo every unit.")
+    parser.add_argument("--report", help="Also write this run's timing report (JSON) to this file.")
+    parser.add_argument("--history", default=str(HISTORY_PATH), help="Run history the report is appended to and compared with (default: %(default)s).")
+    args = parser.parse_args(argv)
 
-def process_dhall_data(dhall_data, hall_name, hall_id=None):
-    for meal_period, stations in dhall_data.items():
-        print(f"Processing {meal_period} for {hall_name}...")
-        flattened_stations = flatten_station_items(stations)
-        for station_name, items in stations.items():
-            print(f"  Station: {station_name} with {len(items)} items.")
-            ai_analysis = analyze_menu_for_ai({station_name: flattened_stations[station_name]})
-            print(ai_analysis)
-            raw_and_bundled_data = prepare_solver_data(items, ai_analysis["offerings"], station_name, meal_period, hall_id)
-            delete_from_db()
-            push_into_db(raw_and_bundled_data)
-
-def main():
     try:
-        all_halls = get_all_dining_halls_info()
-        for hall in all_halls:
-            print(f"Scraping {hall['name']}...")
-            soup = get_soup(hall['url'])
-            dhall_data = scrape_dining_hall(soup, url=str(hall['url']), name=str(hall['name']))
-            print(dhall_data)
-            process_dhall_data(dhall_data, hall['name'], hall['id'])
+        start = time.perf_counter()
+        if args.publish_dir:
+            publish = make_local_publisher(args.publish_dir)
+        elif args.local_store:
+            publish = make_store_publisher()
+        else:
+            publish = publish_hall_menu
+        if args.offline and args.local_store:
+            get_menu_store().replace_dining_halls(get_configured_halls())
+        manifest = RunManifest(get_today_est(), fresh=args.fresh)
+        report = RunReport(get_today_est())
+        published = asyncio.run(run_daily_scrape(get_hall_jobs(args.offline, args.days), publish, manifest, report))
+        if not args.publish_dir:
+            # One snapshot rebuild for the whole run instead of one per published hall
+            refresh_snapshot(get_menu_store())
+        for hall_summary in published:
+            print(f"Published {hall_summary['hall']} ({hall_summary['menu_date']}): {hall_summary['rows']} rows (version {hall_summary['version']}).")
+        print(f"Finished {len(published)} hall menus in {time.perf_counter() - start:.1f}s")
+        print(f"LLM cache stats: {get_llm_cache().stats()}")
     except Exception as e:
         print(f"Error occurred: {e}")
         sys.exit(1)
 
+    summary = manifest.summary()
+    print(f"Run summary: {len(summary['succeeded'])} succeeded, {len(summary['skipped'])} skipped, {len(summary['failed'])} failed.")
+    for key in summary["skipped"]:
+        print(f"  skipped: {key}")
+    for key, error in summary["failed"].items():
+        print(f"  failed: {key}: {error}")
+
+    write_report(report.to_dict(get_llm_cache().stats(), published=len(published), failed=len(summary["failed"])), args.report, args.history)
+    if summary["failed"]:
+        sys.exit(1)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
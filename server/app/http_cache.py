@@ -0,0 +1,66 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from app.query import MENU_STORE_TTL
+
+# When the daily scrape runs (UTC, matching the workflow's cron), which is when cached menus can change
+SCRAPE_TIME_UTC = os.environ.get("SCRAPE_TIME_UTC", "05:01")
+# How long the scrape may take to publish (seconds); servers can then take MENU_STORE_TTL to pick the new menus up
+SCRAPE_DURATION = float(os.environ.get("SCRAPE_DURATION", 1800))
+MIN_MAX_AGE = 60  # seconds, for responses served while new menus may be coming in
+
+
+def make_etag(*parts):
+    """
+    Builds an ETag from the values that identify a response's content (e.g. hall, date, menu version).
+    It is weak because GZipMiddleware sends the same content gzipped or not, which a strong ETag
+    would have to tell apart.
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Returns True if an If-None-Match header value matches `etag` (weak comparison, as RFC 9110 requires for GET).
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+
+def menu_change_window(now=None):
+    """
+    Returns the (start, end) of the current or next period in which served menus can change:
+    from the scrape's start until it has published and every server's local store has re-checked.
+    """
+    now = now or datetime.now(timezone.utc)
+    hour, minute = (int(part) for part in SCRAPE_TIME_UTC.split(":"))
+    start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if start > now:
+        start -= timedelta(days=1)
+    end = start + timedelta(seconds=SCRAPE_DURATION + MENU_STORE_TTL)
+    if end <= now:
+        start, end = start + timedelta(days=1), end + timedelta(days=1)
+    return start, end
+
+
+def cache_headers(etag, now=None):
+    """
+    Headers for a cacheable response: browsers and CDNs may reuse it until the next scrape's
+    menus are certain to be served, then revalidate with If-None-Match. While the scrape is
+    running, responses (304s included) are only cached briefly, so an old menu isn't kept all day.
+    Caches keep the gzipped and identity encodings apart (Vary), as both share the ETag.
+    """
+    now = now or datetime.now(timezone.utc)
+    start, end = menu_change_window(now)
+    if start <= now:
+        cache_control = f"public, max-age={MIN_MAX_AGE}, s-maxage={MIN_MAX_AGE}, must-revalidate"
+    else:
+        max_age = int((end - now).total_seconds())
+        cache_control = f"public, max-age={max_age}, s-maxage={max_age}"
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
@@ -0,0 +1,128 @@
+import os
+import re
+import hashlib
+import json
+from pathlib import Path
+from diskcache import Cache
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = Path(os.environ.get("LLM_CACHE_DIR", BASE_DIR / ".cache" / "llm"))
+CACHE_SIZE_LIMIT = int(os.environ.get("LLM_CACHE_SIZE_LIMIT", 64 * 1024 * 1024))  # bytes
+# Jaccard similarity needed to reuse a grouping for a slightly different item list.
+# 0 disables fuzzy matching (exact hits only).
+FUZZY_THRESHOLD = float(os.environ.get("LLM_CACHE_FUZZY_THRESHOLD", 0))
+FUZZY_INDEX_SIZE = 32  # item lists remembered per station for fuzzy lookups
+
+
+def normalize_name(name: str):
+    return re.sub(r"\s+", " ", name).strip().casefold()
+
+
+def make_cache_key(station_name: str, item_list, prompt_version: str):
+    """
+    Builds a stable cache key for a station grouping request.
+    Item order and casing/whitespace differences do not change the key.
+    """
+    payload = json.dumps(
+        [normalize_name(station_name), sorted({normalize_name(i) for i in item_list}), prompt_version]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def remap_offerings(offerings, item_list):
+    """
+    Rewrites cached offerings so item names match the spelling of the current scrape.
+    Items that are no longer on the menu are dropped, and offerings left empty are removed
+    (prepare_solver_data's safety net still picks up any uncovered raw items).
+    """
+    current = {normalize_name(i): i for i in item_list}
+    remapped = []
+    for offering in offerings:
+        items = [current[normalize_name(i)] for i in offering["items"] if normalize_name(i) in current]
+        if items:
+            remapped.append({**offering, "items": items})
+    return remapped
+
+
+class StationGroupingCache:
+    """
+    Persistent on-disk cache in front of the station grouping LLM call.
+
+    Entries are evicted least-recently-used once the cache grows past `size_limit` bytes.
+    """
+
+    def __init__(self, directory=CACHE_DIR, size_limit=CACHE_SIZE_LIMIT, fuzzy_threshold=FUZZY_THRESHOLD):
+        self.cache = Cache(str(directory), size_limit=size_limit, eviction_policy="least-recently-used")
+        self.fuzzy_threshold = fuzzy_threshold
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    def _index_key(self, station_name, prompt_version):
+        return ("index", normalize_name(station_name), prompt_version)
+
+    def get(self, station_name, item_list, prompt_version):
+        """
+        Returns the cached offerings for this station/item list, or None on a miss.
+        """
+        offerings = self.cache.get(make_cache_key(station_name, item_list, prompt_version))
+        if offerings is not None:
+            self.hits += 1
+            return remap_offerings(offerings, item_list)
+
+        if self.fuzzy_threshold > 0:
+            offerings = self._get_fuzzy(station_name, item_list, prompt_version)
+            if offerings is not None:
+                self.fuzzy_hits += 1
+                return remap_offerings(offerings, item_list)
+
+        self.misses += 1
+        return None
+
+    def _get_fuzzy(self, station_name, item_list, prompt_version):
+        wanted = {normalize_name(i) for i in item_list}
+        best_key, best_score = None, 0.0
+        for items, key in self.cache.get(self._index_key(station_name, prompt_version), []):
+            items = set(items)
+            score = len(wanted & items) / len(wanted | items) if wanted | items else 0.0
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is None or best_score < self.fuzzy_threshold:
+            return None
+        return self.cache.get(best_key)
+
+    def set(self, station_name, item_list, prompt_version, offerings):
+        key = make_cache_key(station_name, item_list, prompt_version)
+        self.cache.set(key, offerings)
+
+        index_key = self._index_key(station_name, prompt_version)
+        items = sorted({normalize_name(i) for i in item_list})
+        index = [entry for entry in self.cache.get(index_key, []) if entry[1] != key]
+        index.append((items, key))
+        self.cache.set(index_key, index[-FUZZY_INDEX_SIZE:])
+
+    def stats(self):
+        lookups = self.hits + self.fuzzy_hits + self.misses
+        return {
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.fuzzy_hits) / lookups if lookups else 0.0,
+            "entries": len(self.cache),
+            "size_bytes": self.cache.volume(),
+        }
+
+    def close(self):
+        self.cache.close()
+
+
+_llm_cache = None
+
+def get_llm_cache():
+    """
+    Returns the process-wide grouping cache, opening it on first use.
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = StationGroupingCache()
+    return _llm_cache
@@ -1,6 +1,8 @@
+import logging
 import pulp
 from app.query import fetch_menu_items
-from pydantic import BaseModel
+from app.metrics import StageTimer, OPTIMIZE_STAGE_LATENCY, SOLVER_ITERATIONS, SOLVER_VARIABLES, SOLVER_CONSTRAINTS
+from app.schemas import MenuOption, LPSolverResult, MealRequest  # re-exported for existing imports
 
 CAL_MIN = 900
 CAL_MAX = 1200
@@ -8,41 +10,7 @@ PROTEIN_MIN = 60
 FAT_MAX = 60
 CARB_MAX = 150
 
-class MenuOption(BaseModel):
-    name: str
-    id: int
-    components: list[str] = []
-    quantity: int
-    station: str = ""
-    calories_kcal: int
-    protein_g: int
-    total_carbohydrate_g: int
-    total_fat_g: int
-
-class LPSolverResult(BaseModel):
-    options: list[MenuOption]
-    total_calories_kcal: int = 0
-    total_protein_g: int = 0
-    total_carbohydrate_g: int = 0
-    total_fat_g: int = 0
-
-class MealRequest(BaseModel):
-    dining_hall_id: int
-    meal_period: str
-    calories_min: int
-    calories_max: int
-    protein_min: int | None = None
-    protein_max: int | None = None
-    fat_min: int | None = None
-    fat_max: int | None = None
-    carb_min: int | None = None
-    carb_max: int | None = None
-    sugars_min: int | None = None
-    sugars_max: int | None = None
-    sodium_min: int | None = None
-    sodium_max: int | None = None
-    traits: list[str] = []
-    allergens: list[str] = []
+logger = logging.getLogger(__name__)
 
 def execute_lp_solver(
         # cal_min=CAL_MIN, 
@@ -59,14 +27,20 @@ def execute_lp_solver(
         # sodium_max=None,
         # traits=[],
         # allergens=[]
-        mr: MealRequest
+        mr: MealRequest,
+        offerings: list | None = None,  # already fetched menu items (e.g. by the async API handler)
+        timer: StageTimer | None = None,  # collects the stage breakdown (fetch, build, solve, assemble, cut)
       ):
-    print(f'Generating meal options based on user contraints: {mr}')
+    timer = timer or StageTimer(OPTIMIZE_STAGE_LATENCY)
+    logger.info("Generating meal options for constraints: %s", mr)
     # -----------------------
     # 1) Fetch Data
     # -----------------------
-    offerings = fetch_menu_items(mr.dining_hall_id, mr.meal_period, mr.traits, mr.allergens)
-    print(f'Evaluating meal options from today\' menu: {offerings}')
+    if offerings is None:
+        with timer.stage("fetch"):
+            offerings = fetch_menu_items(mr.dining_hall_id, mr.meal_period, mr.traits, mr.allergens, mr.menu_date and mr.menu_date.isoformat())
+    logger.debug("Evaluating %d offerings: %s", len(offerings), offerings)
+    timer.start("build")
 
     # -----------------------
     # 2) Setup Solver
@@ -167,18 +141,23 @@ def execute_lp_solver(
     solutions_found = 0
     desired_options = 10
 
-    print("\n--- GENERATING MENUS ---")
+    timer.stop("build")
 
     all_menus = []
 
     while solutions_found < desired_options:
-        status = prob.solve(pulp.PULP_CBC_CMD(msg=0))
+        SOLVER_VARIABLES.observe(prob.numVariables())
+        SOLVER_CONSTRAINTS.observe(prob.numConstraints())
+        with timer.stage("solve"):
+            status = prob.solve(pulp.PULP_CBC_CMD(msg=0))
         if status != 1:
-            print("Stopped: No more unique feasible menus found.")
+            SOLVER_ITERATIONS.inc(outcome="stopped")
+            logger.debug("Stopped after %d menus: no more unique feasible menus", solutions_found)
             break
+        SOLVER_ITERATIONS.inc(outcome="optimal")
 
         solutions_found += 1
-        print(f"\n🍱 MENU OPTION #{solutions_found}")
+        timer.start("assemble")
 
         total_cal = 0
         total_pro = 0
@@ -191,8 +170,7 @@ def execute_lp_solver(
             qty = int(round(x[o["id"]].varValue or 0))
             if qty > 0:
                 used_ids.append(o["id"])
-                tag = "[MAIN]" if any(x[o["id"]] is v for v in mains) else "[SIDE]"
-                print(f"  - {qty}x ({o['id']}) {o['name']} {tag} ({o['calories_kcal']} kcal, {o['protein_g']}g pro)")
+                logger.debug("Menu %d: %dx (%s) %s (%s kcal, %sg protein)", solutions_found, qty, o["id"], o["name"], o["calories_kcal"], o["protein_g"])
 
                 total_cal += o["calories_kcal"] * qty
                 total_pro += o["protein_g"] * qty
@@ -215,7 +193,9 @@ def execute_lp_solver(
         lp_solver_result.total_carbohydrate_g = total_carb
         lp_solver_result.total_fat_g = total_fat
         all_menus.append(lp_solver_result)
-        print(f"  Totals: {total_cal} kcal, {total_pro}g Protein, {total_carb}g Carbs, {total_fat}g Fat")
+        logger.debug("Menu %d totals: %s kcal, %sg protein, %sg carbs, %sg fat", solutions_found, total_cal, total_pro, total_carb, total_fat)
+        timer.stop("assemble")
+        timer.start("cut")
 
         # ---- Update reuse counts (penalize items used in this menu next time)
         for item_id in used_ids:
@@ -227,7 +207,9 @@ def execute_lp_solver(
         # ---- No-good cut (prevents exact repeats)
         sol_vals = {o["id"]: int(round(x[o["id"]].varValue or 0)) for o in offerings}
         add_no_good_cut_0_2(prob, x, sol_vals, solutions_found)
-    
+        timer.stop("cut")
+
+    logger.info("Found %d menus from %d offerings", len(all_menus), len(offerings))
     return all_menus
 
 def add_no_good_cut_0_2(prob, x_dict, sol_vals, iter_k):
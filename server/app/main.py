@@ -1,16 +1,65 @@
-from fastapi import FastAPI
-from app.query import get_all_dining_halls_info, get_dining_hall_default_menu
+from fastapi import FastAPI, Request, Response
+from app import async_query
+from app.query import get_supabase
 from pydantic import BaseModel
-from app.lp import LPSolverResult, execute_lp_solver
+from app.schemas import LPSolverResult, MealRequest
+from app.store import get_menu_store
+from app.utils import get_today_est
+from app.http_cache import make_etag, etag_matches, cache_headers
+from app.responses import FastJSONResponse, compact_solver_results
+from app.metrics import (
+    render_metrics, StageTimer, HTTP_REQUESTS, HTTP_LATENCY, HTTP_NOT_MODIFIED, OPTIMIZE_STAGE_LATENCY,
+)
+from typing import Literal
 from fastapi.middleware.cors import CORSMiddleware
-from app.lp import MealRequest
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+import asyncio
+import datetime
+import logging
+import os
+import threading
+import time
+
+# Set WARMUP=1 to load the solver and connect to Supabase in the background right after startup,
+# instead of on the first request that needs them
+WARMUP = os.environ.get("WARMUP") == "1"
+# Responses at least this large (bytes) are gzip-compressed for clients that accept it
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", 1000))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+# With ALLOW_PROFILING=1, requests sent with "X-Profile: 1" get their stage breakdown back in a
+# Server-Timing header. Off by default, as it exposes server internals to any client.
+ALLOW_PROFILING = os.environ.get("ALLOW_PROFILING", "0") == "1"
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("httpx").setLevel(logging.WARNING)  # one line per PostgREST call otherwise
 
 
 class DiningHallMenuRequest(BaseModel):
     dining_hall_id: int
     meal_period: str
 
+def warm_up():
+    """
+    Pays the lazy import and connection costs up front: the solver module, the Supabase client and the menu store.
+    """
+    import app.lp  # noqa: F401
+    get_menu_store()
+    try:
+        get_supabase()
+    except Exception as e:
+        print(f"Warm-up could not create the Supabase client: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARMUP:
+        threading.Thread(target=warm_up, daemon=True).start()
+    yield
+    await async_query.close_async_client()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="FuelStack API",
     description="Neuro-Symbolic AI Dining Optimization Engine",
     version="1.0.0"
@@ -18,23 +67,89 @@ app = FastAPI(
 
 origins = ["http://localhost:5173", "https://dining-app-zeta.vercel.app"]
 
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the number of series bounded
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        HTTP_REQUESTS.inc(route=path, method=request.method, status=status)
+        HTTP_LATENCY.observe(time.perf_counter() - start, route=path)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/menu")
-async def get_default_menu(id: int, meal_period: str):
-    return get_dining_hall_default_menu(id, meal_period)
+async def get_default_menu(id: int, meal_period: str, request: Request, response: Response, date: datetime.date | None = None):
+    # Menus only change when a new version is published, so the version identifies the response
+    menu_date = date.isoformat() if date else get_today_est()
+    version = await async_query.get_menu_version(id, menu_date)
+    headers = {}
+    if version is not None:
+        etag = make_etag("menu", id, menu_date, meal_period.lower(), version)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            HTTP_NOT_MODIFIED.inc(route="/menu")
+            return Response(status_code=304, headers=cache_headers(etag))
+        headers = cache_headers(etag)
+
+    # Default menus are serialized when the menu is stored, so this is a key lookup returning the bytes as-is
+    body = await async_query.get_default_menu_document(id, meal_period, menu_date)
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return await async_query.get_dining_hall_default_menu(id, meal_period, menu_date)
 
 @app.get("/get-dining-halls")
-async def get_all_dining_halls():
-    return get_all_dining_halls_info()
+async def get_all_dining_halls(request: Request, response: Response):
+    digest = await async_query.get_dining_halls_digest()
+    if digest is not None:
+        etag = make_etag("halls", digest)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            HTTP_NOT_MODIFIED.inc(route="/get-dining-halls")
+            return Response(status_code=304, headers=cache_headers(etag))
+        response.headers.update(cache_headers(etag))
+    return await async_query.get_all_dining_halls_info()
 
 @app.post("/optimize-meal")
-async def optimize_meal(meal_request: MealRequest) -> list[LPSolverResult]:
-    return execute_lp_solver(meal_request)
+async def optimize_meal(
+        meal_request: MealRequest, request: Request, response: Response, format: Literal["full", "compact"] = "full"
+      ) -> list[LPSolverResult]:
+    """
+    Returns up to 10 menus. With ?format=compact, each item is sent once and menus reference
+    items by id and quantity (see app.responses.compact_solver_results).
+    """
+    from app.lp import execute_lp_solver  # pulp is only loaded once a meal is optimized
+    mr = meal_request
+    timer = StageTimer(OPTIMIZE_STAGE_LATENCY)
+    with timer.stage("fetch"):
+        offerings = await async_query.fetch_menu_items(
+            mr.dining_hall_id, mr.meal_period, mr.traits, mr.allergens, mr.menu_date and mr.menu_date.isoformat()
+        )
+    # The solver is CPU bound, keep it off the event loop
+    results = await asyncio.to_thread(execute_lp_solver, meal_request, offerings, timer)
 
+    headers = {}
+    if ALLOW_PROFILING and request.headers.get("x-profile") == "1":
+        headers["Server-Timing"] = timer.server_timing()
+    if format == "compact":
+        return FastJSONResponse(compact_solver_results(results), headers=headers)
+    response.headers.update(headers)
+    return results
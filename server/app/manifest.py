@@ -0,0 +1,83 @@
+import json
+import os
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RUNS_DIR = Path(os.environ.get("SCRAPE_RUNS_DIR", BASE_DIR / ".cache" / "runs"))
+# Attempts a unit gets in each run; a rerun the same day starts a fresh budget for the units still failed
+MAX_UNIT_ATTEMPTS = int(os.environ.get("SCRAPE_MAX_UNIT_ATTEMPTS", 3))
+
+DONE = "done"
+FAILED = "failed"
+
+
+def unit_key(*parts):
+    """
+    Builds a manifest key such as "4|Lunch|Signature Maize" from a unit's parts.
+    """
+    return "|".join(str(part) for part in parts)
+
+
+class RunManifest:
+    """
+    Checkpoints the result of every unit of work of a scrape run to local disk,
+    so a rerun only redoes units that failed or never ran.
+
+    Each unit is stored as {"status", "attempts", "error", "result"}, where attempts counts the
+    failed attempts across all runs of the day.
+    """
+
+    def __init__(self, run_id: str, directory=RUNS_DIR, fresh=False):
+        self.path = Path(directory) / f"{run_id}.json"
+        self.units = {}
+        if self.path.exists() and not fresh:
+            with open(self.path, "r") as f:
+                self.units = json.load(f)["units"]
+        # Units touched during this run, for the summary
+        self.completed = []
+        self.reused = []
+        self.run_failures = {}  # key -> failed attempts in this run
+
+    def get_result(self, key):
+        """
+        Returns the checkpointed result of a finished unit, or None if it still has to run.
+        """
+        unit = self.units.get(key)
+        if unit and unit["status"] == DONE:
+            self.reused.append(key)
+            return unit["result"]
+        return None
+
+    def attempts_left(self, key):
+        """
+        Returns how many more times this run may try the unit. Only failures count.
+        """
+        return MAX_UNIT_ATTEMPTS - self.run_failures.get(key, 0)
+
+    def record(self, key, status, result=None, error=None):
+        unit = self.units.setdefault(key, {"attempts": 0})
+        unit.update(status=status, result=result, error=error)
+        if status == FAILED:
+            unit["attempts"] += 1
+            self.run_failures[key] = self.run_failures.get(key, 0) + 1
+        self.completed.append(key)
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"units": self.units}, f)
+        os.replace(tmp_path, self.path)  # atomic, so a crash never leaves a torn manifest
+
+    def summary(self):
+        """
+        Returns what this run did: units that succeeded, were skipped because they were reused
+        from a checkpoint, and every unit of the day that is still failed.
+        """
+        this_run = {key: self.units[key] for key in dict.fromkeys(self.completed)}
+        return {
+            "succeeded": [key for key, unit in this_run.items() if unit["status"] == DONE],
+            "skipped": sorted(set(self.reused)),
+            "failed": {key: unit["error"] for key, unit in self.units.items() if unit["status"] == FAILED},
+        }
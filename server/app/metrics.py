@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, Prometheus' defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class Metric:
+    """
+    Base for metrics with optional labels, kept per process (each API worker reports its own).
+    """
+    type = None
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}  # sorted label items -> value
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.extend(self._render_value(dict(labels), value))
+        return lines
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {value}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def _render_value(self, labels, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip([*self.buckets, "+Inf"], counts[:-1]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {counts[-1]}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render_metrics():
+    """
+    Returns every registered metric in the Prometheus text exposition format.
+    """
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+class StageTimer:
+    """
+    Times the stages of one request into `histogram` (labelled by stage) and keeps the
+    request's own breakdown for profiling. Repeated stages (e.g. solver iterations) add up.
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.stages = {}  # stage -> [total seconds, count]
+        self._started = {}
+
+    def start(self, name):
+        self._started[name] = time.perf_counter()
+
+    def stop(self, name):
+        elapsed = time.perf_counter() - self._started.pop(name)
+        self.histogram.observe(elapsed, stage=name)
+        total = self.stages.setdefault(name, [0.0, 0])
+        total[0] += elapsed
+        total[1] += 1
+        return elapsed
+
+    @contextmanager
+    def stage(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def server_timing(self):
+        """
+        Formats the breakdown as a Server-Timing header value, e.g. "fetch;dur=1.2, solve;dur=30.5;desc=\"10x\"".
+        """
+        parts = []
+        for name, (seconds, count) in self.stages.items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+# Metrics of the API
+HTTP_REQUESTS = Counter("fuelstack_http_requests_total", "HTTP requests by route, method and status.")
+HTTP_LATENCY = Histogram("fuelstack_http_request_seconds", "HTTP request latency by route.")
+OPTIMIZE_STAGE_LATENCY = Histogram("fuelstack_optimize_stage_seconds", "Time spent per /optimize-meal stage (solve is per iteration).")
+SOLVER_ITERATIONS = Counter("fuelstack_solver_iterations_total", "Solver runs, by outcome (optimal or stopped).")
+SOLVER_VARIABLES = Histogram("fuelstack_solver_model_variables", "Variables in the solver model at each solve.", SIZE_BUCKETS)
+SOLVER_CONSTRAINTS = Histogram("fuelstack_solver_model_constraints", "Constraints in the solver model at each solve.", SIZE_BUCKETS)
+MENU_CACHE = Counter("fuelstack_menu_cache_total", "Local menu store lookups: hit, revalidated (unchanged version), miss (reloaded) or stale (source unavailable).")
+HTTP_NOT_MODIFIED = Counter("fuelstack_http_not_modified_total", "Conditional GETs answered with 304, by route.")
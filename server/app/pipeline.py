@@ -0,0 +1,55 @@
+import asyncio
+
+# Marks the end of a stage's input; passed along once every worker of a stage has finished.
+STOP = object()
+
+
+async def _run_stage(worker, inbox, outbox, concurrency):
+    async def work():
+        while True:
+            item = await inbox.get()
+            if item is STOP:
+                # Put it back so sibling workers of this stage stop too
+                await inbox.put(STOP)
+                return
+            for result in await worker(item) or []:
+                await outbox.put(result)
+
+    await asyncio.gather(*(work() for _ in range(concurrency)))
+    await outbox.put(STOP)
+
+
+async def run_pipeline(source_items, stages, queue_size=32):
+    """
+    Streams items through a chain of async stages connected by bounded queues.
+
+    Every stage runs its own pool of workers, so a slow stage only holds back the
+    items behind it and total wall time approaches that of the slowest stage.
+
+    Args:
+        source_items (iterable): Items fed into the first stage.
+        stages (list): [(worker, concurrency), ...]. A worker is an async function taking
+            one item and returning a list of items for the next stage (or None).
+        queue_size (int): Maximum number of items waiting between two stages.
+    Returns:
+        list: Everything emitted by the last stage.
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    async def feed():
+        for item in source_items:
+            await queues[0].put(item)
+        await queues[0].put(STOP)
+
+    async def drain():
+        results = []
+        while (item := await queues[-1].get()) is not STOP:
+            results.append(item)
+        return results
+
+    *_, results = await asyncio.gather(
+        feed(),
+        *(_run_stage(worker, queues[i], queues[i + 1], concurrency) for i, (worker, concurrency) in enumerate(stages)),
+        drain(),
+    )
+    return results
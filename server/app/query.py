@@ -1,14 +1,38 @@
 import os
-from supabase import create_client, Client
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
-from datetime import datetime
-from zoneinfo import ZoneInfo
+from datetime import datetime, timezone
+from app.utils import get_today_est, get_retention_cutoff
+from app.store import get_menu_store
+from app.snapshot import get_menu_snapshot, schedule_snapshot_refresh
+from app.metrics import MENU_CACHE
 
 load_dotenv()
 
 URL = api_key=os.environ.get("SUPABASE_PROJECT_URL")
 KEY = os.environ.get("SUPABASE_ANON_API_KEY")
-supabase: Client = create_client(URL, KEY)
+_supabase = None
+_supabase_lock = threading.Lock()
+
+PUBLISH_CHUNK_SIZE = 500  # rows per bulk insert request
+# How long the local menu store serves a hall/date before re-checking Supabase for a newer version
+MENU_STORE_TTL = float(os.environ.get("MENU_STORE_TTL", 300))
+# Serve reads from the local store only (offline stack / tests)
+MENU_STORE_ONLY = os.environ.get("MENU_STORE_ONLY") == "1"
+
+def get_supabase():
+    """
+    Returns the shared Supabase client, creating it on first use.
+    The supabase package is imported here too, so importing this module stays cheap on cold start.
+    """
+    global _supabase
+    with _supabase_lock:
+        if _supabase is None:
+            from supabase import create_client
+            _supabase = create_client(URL, KEY)
+        return _supabase
 
 def push_into_db(data):
     """
@@ -22,7 +46,7 @@ def push_into_db(data):
     table_name = "menu_items"
     try:
         response = (
-            supabase.table(table_name)
+            get_supabase().table(table_name)
             .insert(data) # Insert takes a list of dictionaries for single or bulk inserts
             .execute()
         )
@@ -34,7 +58,7 @@ def delete_from_db():
     table_name = "menu_items"
     try:
         response = (
-            supabase.table(table_name)
+            get_supabase().table(table_name)
             .delete("*")
             .execute(count="exact")
         )
@@ -42,21 +66,218 @@ def delete_from_db():
     except Exception as e:
         print(f"An error occurred: {e}")
 
-def fetch_menu_items(dining_hall_id = None, meal_period = None, traits=[], allergens=[]):
+def publish_hall_menu(rows, dining_hall_id, menu_date=None):
+    """
+    Publishes a hall's full menu for one date as a new version, then makes it live.
+
+    Rows are bulk inserted (PUBLISH_CHUNK_SIZE per request) under a fresh `menu_version`
+    that readers ignore until the hall's pointer in `menu_versions` is swapped to it.
+    The pointer upsert is a single-row write, so readers see either the old menu or the
+    new one, never a partial one. The version being replaced is kept until the next publish,
+    so a reader that looked up the pointer just before the swap can still read its rows;
+    older versions and the hall's menus older than MENU_RETENTION_DAYS are deleted afterwards, and the new menu is mirrored into the local
+    menu store, which serializes the default menus (the caller refreshes the menu snapshot
+    once all halls are published).
+
+    Args:
+        rows (list): Prepared rows for every meal period and station of the hall.
+        dining_hall_id (int): The hall being published.
+        menu_date (str): ISO date the menu is for. Defaults to today (EST).
+    Returns:
+        str: The published menu version.
+    """
+    menu_date = menu_date or get_today_est()
+    published_at = datetime.now(timezone.utc)
+    version = f"{published_at.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    staged_rows = [{**row, "date": menu_date, "menu_version": version} for row in rows]
+    inserted_rows = []
+
+    try:
+        for start in range(0, len(staged_rows), PUBLISH_CHUNK_SIZE):
+            response = get_supabase().table("menu_items").insert(staged_rows[start:start + PUBLISH_CHUNK_SIZE]).execute()
+            inserted_rows.extend(response.data)
+    except Exception:
+        # Staged rows are invisible to readers, but don't leave them behind
+        get_supabase().table("menu_items").delete().eq("menu_version", version).execute()
+        raise
+
+    previous_version = get_active_menu_version(dining_hall_id, menu_date)
+    (
+        get_supabase().table("menu_versions")
+        .upsert(
+            {"dining_hall_id": dining_hall_id, "date": menu_date, "version": version, "published_at": published_at.isoformat()},
+            on_conflict="dining_hall_id,date",
+        )
+        .execute()
+    )
+
+    kept_versions = ",".join(v for v in (version, previous_version) if v)
+    response = (
+        get_supabase().table("menu_items")
+        .delete(count="exact", returning="minimal")
+        .eq("dining_hall_id", dining_hall_id)
+        .eq("date", menu_date)
+        .or_(f"menu_version.is.null,menu_version.not.in.({kept_versions})")
+        .execute()
+    )
+    print(f"Published {len(staged_rows)} rows for hall {dining_hall_id} on {menu_date} (version {version}, {response.count} old rows removed).")
+    prune_hall_menus(dining_hall_id)
+
+    try:
+        get_menu_store().replace_hall_menu(inserted_rows, dining_hall_id, menu_date, version)
+    except Exception as e:
+        print(f"Could not update the local menu store: {e}")
+    return version
+
+def prune_hall_menus(dining_hall_id):
+    """
+    Deletes a hall's menu rows and version pointers dated before the retention cutoff.
+    Failures are only logged, the next publish tries again.
+    """
+    cutoff = get_retention_cutoff()
+    try:
+        response = (
+            get_supabase().table("menu_items")
+            .delete(count="exact", returning="minimal")
+            .eq("dining_hall_id", dining_hall_id)
+            .lt("date", cutoff)
+            .execute()
+        )
+        get_supabase().table("menu_versions").delete(returning="minimal").eq("dining_hall_id", dining_hall_id).lt("date", cutoff).execute()
+        if response.count:
+            print(f"Pruned {response.count} rows dated before {cutoff} for hall {dining_hall_id}.")
+    except Exception as e:
+        print(f"Could not prune old menus: {e}")
+
+def get_fresh_snapshot(dining_hall_id, menu_date):
+    """
+    Returns the menu snapshot if it holds this hall/date menu loaded less than MENU_STORE_TTL
+    seconds ago, so the request needs neither the store nor Supabase; otherwise None.
+    """
+    try:
+        snapshot = get_menu_snapshot()
+    except Exception as e:
+        print(f"Could not map the menu snapshot: {e}")
+        return None
+    loaded = snapshot.get_loaded_menu(dining_hall_id, menu_date) if snapshot else None
+    if loaded and (MENU_STORE_ONLY or time.time() - loaded["loaded_at"] < MENU_STORE_TTL):
+        MENU_CACHE.inc(result="hit")
+        return snapshot
+    return None
+
+def sync_hall_menu(dining_hall_id, menu_date):
+    """
+    Makes sure the live menu of a hall for a date can be served locally.
+
+    A stored menu is trusted for MENU_STORE_TTL seconds; after that the active version is
+    re-checked and the menu reloaded from Supabase if it changed. If Supabase is unavailable
+    the stored copy keeps being served. Store writes refresh the menu snapshot in the background.
+
+    Returns:
+        The reader to serve the menu from (the menu snapshot or the local store), or None if neither can.
+    """
+    snapshot = get_fresh_snapshot(dining_hall_id, menu_date)
+    if snapshot is not None:
+        return snapshot
+
+    store = get_menu_store()
+    loaded = store.get_loaded_menu(dining_hall_id, menu_date)
+    if MENU_STORE_ONLY:
+        MENU_CACHE.inc(result="hit" if loaded else "miss")
+        return get_menu_reader(dining_hall_id, menu_date, loaded["version"]) if loaded else None
+    if loaded and time.time() - loaded["loaded_at"] < MENU_STORE_TTL:
+        MENU_CACHE.inc(result="hit")
+        return get_menu_reader(dining_hall_id, menu_date, loaded["version"])
+
+    try:
+        menu_version = get_active_menu_version(dining_hall_id, menu_date)
+        if loaded and menu_version is not None and menu_version == loaded["version"]:
+            store.touch_menu(dining_hall_id, menu_date)
+            schedule_snapshot_refresh(store)  # carries the new loaded_at into the snapshot
+            MENU_CACHE.inc(result="revalidated")
+            return get_menu_reader(dining_hall_id, menu_date, loaded["version"])
+
+        MENU_CACHE.inc(result="miss")
+
+        rows = select_menu_rows(dining_hall_id, menu_date, menu_version)
+        if not rows and menu_version:
+            # The version was superseded between the two reads; follow the pointer once more
+            menu_version = get_active_menu_version(dining_hall_id, menu_date)
+            rows = select_menu_rows(dining_hall_id, menu_date, menu_version)
+            if not rows and menu_version:
+                raise LookupError(f"menu version {menu_version} has no rows")
+        store.replace_hall_menu(rows, dining_hall_id, menu_date, menu_version)
+        schedule_snapshot_refresh(store)
+        return store
+    except Exception as e:
+        print(f"An error occurred while syncing the local menu store: {e}")
+        if loaded is None:
+            return None
+        MENU_CACHE.inc(result="stale")
+        return get_menu_reader(dining_hall_id, menu_date, loaded["version"])
+
+def select_menu_rows(dining_hall_id, menu_date, menu_version):
+    """
+    Returns the menu rows of a hall and date, only those of `menu_version` if given.
+    """
+    q = (
+        get_supabase().table("menu_items")
+        .select("*")
+        .eq("date", menu_date)
+        .eq("dining_hall_id", dining_hall_id)
+    )
+    if menu_version:
+        q = q.eq("menu_version", menu_version)
+    return q.execute().data
+
+def get_menu_reader(dining_hall_id, menu_date, version):
+    """
+    Returns what to read a stored hall/date menu from: the shared memory-mapped snapshot when
+    it holds `version` of the menu, otherwise the local store.
+    """
+    try:
+        snapshot = get_menu_snapshot()
+    except Exception as e:
+        print(f"Could not map the menu snapshot: {e}")
+        snapshot = None
+    loaded = snapshot.get_loaded_menu(dining_hall_id, menu_date) if snapshot else None
+    if loaded and loaded["version"] == version:
+        return snapshot
+    return get_menu_store()
+
+def get_active_menu_version(dining_hall_id, menu_date):
+    """
+    Returns the live menu version for a hall and date, or None if the hall has no published version.
+    """
+    response = (
+        get_supabase().table("menu_versions")
+        .select("version")
+        .eq("dining_hall_id", dining_hall_id)
+        .eq("date", menu_date)
+        .execute()
+    )
+    return response.data[0]["version"] if response.data else None
+
+def fetch_menu_items(dining_hall_id = None, meal_period = None, traits=[], allergens=[], menu_date=None):
     """
     Fetches all menu items from the Supabase database.
-    
+
+    Args:
+        menu_date (str): ISO date of the menu. Defaults to today (EST).
     Returns:
         list: A list of menu items.
     """
     if dining_hall_id is None or meal_period is None:
         return []
 
-    est_now = datetime.now(ZoneInfo("America/New_York"))
-    today_date_est = est_now.date().isoformat()
+    today_date_est = menu_date or get_today_est()
+
+    reader = sync_hall_menu(dining_hall_id, today_date_est)
+    if reader is not None:
+        return reader.fetch_menu_items(dining_hall_id, meal_period, today_date_est, traits, allergens)
 
     q = (
-        supabase.table("menu_items")
+        get_supabase().table("menu_items")
         .select("*")
         .eq("date", today_date_est)
         .eq("dining_hall_id", dining_hall_id)
@@ -70,6 +291,9 @@ def fetch_menu_items(dining_hall_id = None, meal_period = None, traits=[], aller
         q = q.not_.contains("allergens", [allergen])
 
     try:
+        menu_version = get_active_menu_version(dining_hall_id, today_date_est)
+        if menu_version:
+            q = q.eq("menu_version", menu_version)
         return q.execute().data
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -78,37 +302,49 @@ def fetch_menu_items(dining_hall_id = None, meal_period = None, traits=[], aller
 def get_all_dining_halls_info():
     """
     Fetches all dining hall information.
+    Served from the local menu store for MENU_STORE_TTL seconds after each refresh.
     """
+    store = get_menu_store()
+    halls, loaded_at = store.get_dining_halls()
+    if loaded_at is not None and (MENU_STORE_ONLY or time.time() - loaded_at < MENU_STORE_TTL):
+        return halls
+
     try:
         response = (
-            supabase.table("daily_hall_status")
+            get_supabase().table("daily_hall_status")
             .select("*")
             .execute()
         )
+        store.replace_dining_halls(response.data)
         return response.data
     except Exception as e:
         print(f"An error occurred: {e}")
-        return []
+        return halls
     
-def get_dining_hall_default_menu(dining_hall_id, meal_period):
+def get_dining_hall_default_menu(dining_hall_id, meal_period, menu_date=None):
     """
-    Fetch specific (default) dining hall menu
+    Fetch specific (default) dining hall menu, for today (EST) unless `menu_date` is given
     """
 
-    est_now = datetime.now(ZoneInfo("America/New_York"))
-    today_date_est = est_now.date().isoformat()
+    today_date_est = menu_date or get_today_est()
+
+    reader = sync_hall_menu(dining_hall_id, today_date_est)
+    if reader is not None:
+        return reader.get_default_menu(dining_hall_id, meal_period, today_date_est)
 
     try:
-        response = (
-            supabase.table("menu_items")
+        q = (
+            get_supabase().table("menu_items")
             .select("*")
             .eq("date", today_date_est)
             .eq("dining_hall_id", dining_hall_id)
             .eq("meal_period", meal_period)
             .eq("convenience_score", 1)
-            .execute()
         )
-        return response.data
+        menu_version = get_active_menu_version(dining_hall_id, today_date_est)
+        if menu_version:
+            q = q.eq("menu_version", menu_version)
+        return q.execute().data
     except Exception as e:
         print(f"An error occurred: {e}")
         return []
\ No newline at end of file
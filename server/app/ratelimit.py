@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+
+# Provider limits for llama-3.3-70b-versatile on our Groq plan.
+LLM_RPM = int(os.environ.get("LLM_RPM", 30))
+LLM_TPM = int(os.environ.get("LLM_TPM", 12000))
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at `rate_per_minute`.
+    Waiters are served in FIFO order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.capacity = capacity or rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+        self._lock_loop = None
+
+    def _get_lock(self):
+        # asyncio locks are tied to one event loop; the daily job may run a fresh loop per hall.
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        # A single request larger than the bucket would otherwise wait forever.
+        amount = min(amount, self.capacity)
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Enforces both a requests-per-minute and a tokens-per-minute budget.
+    """
+
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    async def acquire(self, estimated_tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+
+def estimate_tokens(*texts: str, completion_tokens: int = 512):
+    """
+    Rough token count for rate limiting (~4 characters per token) plus the expected completion.
+    """
+    return sum(len(t) for t in texts) // 4 + completion_tokens
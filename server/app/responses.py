@@ -0,0 +1,41 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson, which serializes several times faster than the json module.
+    Content must be plain JSON types (dump pydantic models first).
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+ITEM_FIELDS = ["name", "components", "station", "calories_kcal", "protein_g", "total_carbohydrate_g", "total_fat_g"]
+TOTAL_FIELDS = ["total_calories_kcal", "total_protein_g", "total_carbohydrate_g", "total_fat_g"]
+
+
+def compact_solver_results(results):
+    """
+    Converts optimize results into the compact response format, where every item is sent once:
+
+        {"items": {"<id>": {"name", "components", "station", <nutrients>}},
+         "menus": [{"options": [[id, quantity], ...], "total_calories_kcal", ...}]}
+
+    Args:
+        results (list): LPSolverResult objects from execute_lp_solver.
+    Returns:
+        dict: The compact response body.
+    """
+    items = {}
+    menus = []
+    for result in results:
+        for option in result.options:
+            if option.id not in items:
+                items[option.id] = {field: getattr(option, field) for field in ITEM_FIELDS}
+        menus.append({
+            "options": [[option.id, option.quantity] for option in result.options],
+            **{field: getattr(result, field) for field in TOTAL_FIELDS},
+        })
+    return {"items": {str(item_id): item for item_id, item in items.items()}, "menus": menus}
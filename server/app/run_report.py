@@ -0,0 +1,136 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.manifest import RUNS_DIR
+
+HISTORY_PATH = Path(os.environ.get("SCRAPE_HISTORY_PATH", RUNS_DIR / "history.jsonl"))
+# Slowdown against the previous run before a stage is flagged in the comparison
+REPORT_TOLERANCE = float(os.environ.get("SCRAPE_REPORT_TOLERANCE", 0.25))
+MIN_COMPARED_SECONDS = 1.0  # stages faster than this are too noisy to flag
+
+STAGES = ["fetch", "parse", "group", "prepare", "publish"]
+
+
+class RunReport:
+    """
+    Collects where a scrape run spends its time: wall time per stage per (hall, menu date),
+    every LLM call with its token usage, row counts and LLM cache stats.
+
+    Stages run concurrently across halls, so per-stage totals can add up to more than the run's wall time.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self.halls = {}  # "<hall>|<menu date>" -> {"stages", "llm_calls", "rows"}
+
+    def _hall(self, hall_name, menu_date):
+        return self.halls.setdefault(f"{hall_name}|{menu_date}", {"stages": {}, "llm_calls": [], "rows": 0})
+
+    def add_stage(self, hall_name, menu_date, stage, seconds):
+        total = self._hall(hall_name, menu_date)["stages"].setdefault(stage, {"seconds": 0.0, "count": 0})
+        total["seconds"] += seconds
+        total["count"] += 1
+
+    @contextmanager
+    def stage(self, hall_name, menu_date, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(hall_name, menu_date, stage, time.perf_counter() - start)
+
+    def add_llm_call(self, hall_name, menu_date, call):
+        """
+        Records one LLM request, e.g. {"meal_period", "stations", "seconds", "attempts", "prompt_tokens", ...}.
+        """
+        self._hall(hall_name, menu_date)["llm_calls"].append(call)
+
+    def add_rows(self, hall_name, menu_date, rows):
+        self._hall(hall_name, menu_date)["rows"] += rows
+
+    def to_dict(self, llm_cache_stats=None, published=0, failed=0):
+        """
+        Returns the machine-readable report, with totals across halls next to the per-hall breakdown.
+        """
+        stage_totals = {}
+        llm = {"calls": 0, "failed_calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        for hall in self.halls.values():
+            for stage, total in hall["stages"].items():
+                summed = stage_totals.setdefault(stage, {"seconds": 0.0, "count": 0})
+                summed["seconds"] += total["seconds"]
+                summed["count"] += total["count"]
+            for call in hall["llm_calls"]:
+                llm["calls"] += 1
+                llm["failed_calls"] += 1 if call.get("error") else 0
+                llm["seconds"] += call["seconds"]
+                for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                    llm[field] += call.get(field) or 0
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "wall_seconds": time.perf_counter() - self._start,
+            "published": published,
+            "failed": failed,
+            "rows": sum(hall["rows"] for hall in self.halls.values()),
+            "stages": {stage: stage_totals[stage] for stage in sorted(stage_totals, key=_stage_order)},
+            "llm": llm,
+            "llm_cache": llm_cache_stats or {},
+            "halls": self.halls,
+        }
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+def load_last_report(path=HISTORY_PATH):
+    """
+    Returns the most recent report in the history file, or None if there is none.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    last = None
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                last = line
+    return json.loads(last) if last else None
+
+
+def append_report(report, path=HISTORY_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(report) + "\n")
+
+
+def compare_reports(current, previous, tolerance=REPORT_TOLERANCE):
+    """
+    Compares a run's totals against the previous run.
+    Returns:
+        tuple: (lines describing every change, lines for the regressions among them)
+    """
+    lines, regressions = [], []
+
+    def check(name, now, before, unit="s"):
+        precision = 1 if unit == "s" else 0
+        change = f"{name}: {before:.{precision}f}{unit} -> {now:.{precision}f}{unit}"
+        if before:
+            change += f" ({now / before - 1:+.0%})"
+        lines.append(change)
+        if unit == "s" and max(now, before) >= MIN_COMPARED_SECONDS and now > before * (1 + tolerance):
+            regressions.append(change)
+
+    check("wall time", current["wall_seconds"], previous["wall_seconds"])
+    for stage in sorted(set(current["stages"]) | set(previous["stages"]), key=_stage_order):
+        check(f"{stage} (summed over halls)", current["stages"].get(stage, {}).get("seconds", 0.0), previous["stages"].get(stage, {}).get("seconds", 0.0))
+    check("LLM tokens", current["llm"]["total_tokens"], previous["llm"]["total_tokens"], unit="")
+    check("rows", current["rows"], previous["rows"], unit="")
+    return lines, regressions
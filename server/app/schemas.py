@@ -0,0 +1,41 @@
+# Request and response models of the API, kept apart from app.lp so the routes can be
+# declared without importing the solver (pulp) at startup.
+from datetime import date
+from pydantic import BaseModel
+
+class MenuOption(BaseModel):
+    name: str
+    id: int
+    components: list[str] = []
+    quantity: int
+    station: str = ""
+    calories_kcal: int
+    protein_g: int
+    total_carbohydrate_g: int
+    total_fat_g: int
+
+class LPSolverResult(BaseModel):
+    options: list[MenuOption]
+    total_calories_kcal: int = 0
+    total_protein_g: int = 0
+    total_carbohydrate_g: int = 0
+    total_fat_g: int = 0
+
+class MealRequest(BaseModel):
+    dining_hall_id: int
+    meal_period: str
+    calories_min: int
+    calories_max: int
+    protein_min: int | None = None
+    protein_max: int | None = None
+    fat_min: int | None = None
+    fat_max: int | None = None
+    carb_min: int | None = None
+    carb_max: int | None = None
+    sugars_min: int | None = None
+    sugars_max: int | None = None
+    sodium_min: int | None = None
+    sodium_max: int | None = None
+    traits: list[str] = []
+    allergens: list[str] = []
+    menu_date: date | None = None  # YYYY-MM-DD, defaults to today
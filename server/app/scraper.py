@@ -5,15 +5,27 @@ import json
 import re
 from pathlib import Path
 import os
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
-def get_soup(source: str, is_local=False):
+def build_menu_url(url: str, menu_date: str | None = None):
     """
-    Launches a browser, visits the URL or loads local file, and returns a BeautifulSoup object.
+    Returns the hall URL for a specific menu date (YYYY-MM-DD) via the site's ?menuDate= parameter.
+    """
+    if not menu_date:
+        return url
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "menuDate"]
+    query.append(("menuDate", menu_date))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def get_html(source: str, is_local=False):
+    """
+    Launches a browser, visits the URL or loads local file, and returns the page HTML.
     """
     if is_local:
         # Load from the file you saved
         with open(source, "r", encoding="utf-8") as f:
-            return BeautifulSoup(f.read(), "html.parser")
+            return f.read()
     else:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True) 
@@ -29,7 +41,13 @@ def get_soup(source: str, is_local=False):
             
             html_content = page.content()
             browser.close()
-        return BeautifulSoup(html_content, "html.parser")
+        return html_content
+
+def get_soup(source: str, is_local=False):
+    """
+    Launches a browser, visits the URL or loads local file, and returns a BeautifulSoup object.
+    """
+    return BeautifulSoup(get_html(source, is_local), "html.parser")
 
 def split_measurement(s: str):
     """
@@ -0,0 +1,314 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+from app.prepare import NUTRIENTS, TRAITS
+from app.store import build_default_menus
+from app.utils import get_today_est
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SNAPSHOT_DIR = Path(os.environ.get("MENU_SNAPSHOT_DIR", BASE_DIR / ".cache" / "snapshot"))
+POINTER_NAME = "current"  # file holding the number of the live generation
+KEEP_GENERATIONS = 2
+# How often a worker looks for a newer generation (seconds); reads in between use the current mapping
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get("MENU_SNAPSHOT_CHECK_INTERVAL", 1))
+# Store writes this close together (seconds) share one background rebuild
+SNAPSHOT_REFRESH_DELAY = float(os.environ.get("MENU_SNAPSHOT_REFRESH_DELAY", 0.5))
+
+MAGIC = b"FSNAP002"
+HEADER = struct.Struct("<8sQ")  # magic, metadata length
+
+# Row fields that can be stored as packed arrays; everything else goes into a per-row JSON blob
+NUMERIC_COLUMNS = ["id", "dining_hall_id", "convenience_score", *[column for column, _ in NUTRIENTS]]
+
+
+def _mask(names, bits):
+    return sum(1 << bits[name] for name in set(names) if name in bits)
+
+
+def build_snapshot(menus):
+    """
+    Serializes menus into the columnar snapshot format.
+
+    Layout: header | metadata JSON | 8-byte aligned column arrays | row blobs | default menu documents.
+    Metadata maps "date|hall id" to the menu version, when it was loaded, the row range of each
+    meal period and the byte range of each meal period's pre-serialized default menu.
+
+    Args:
+        menus (list): [{"date", "dining_hall_id", "version", "loaded_at", "rows"}, ...] as returned by MenuStore.export_menus.
+    Returns:
+        bytes: The snapshot file contents.
+    """
+    rows = []
+    groups = {}
+    documents = []
+    documents_length = 0
+    for menu in menus:
+        meal_periods = {}
+        for row in menu["rows"]:
+            meal_period = row["meal_period"].lower()
+            start, end = meal_periods.get(meal_period, (len(rows), len(rows)))
+            if end != len(rows):
+                raise ValueError("Menu rows must be ordered by meal period")
+            meal_periods[meal_period] = (start, end + 1)
+            rows.append(row)
+        default_menus = {}
+        for meal_period, body in build_default_menus(menu["rows"]).items():
+            default_menus[meal_period] = (documents_length, documents_length + len(body))
+            documents.append(body)
+            documents_length += len(body)
+        groups[f"{menu['date']}|{menu['dining_hall_id']}"] = {
+            "version": menu["version"],
+            "loaded_at": menu.get("loaded_at", 0),
+            "meal_periods": meal_periods,
+            "default_menus": default_menus,
+        }
+
+    allergen_bits = {name: bit for bit, name in enumerate(sorted({a for row in rows for a in row.get("allergens", [])}))}
+    trait_bits = {trait: bit for bit, trait in enumerate(TRAITS)}
+
+    # A numeric field becomes a packed column only if it has one type across all rows, so values
+    # (and their JSON form) come back exactly as stored; mixed fields stay in the row blob
+    columns = {}
+    for column in NUMERIC_COLUMNS:
+        values = [row.get(column) for row in rows]
+        if all(type(v) is int for v in values):
+            columns[column] = array("q", values)
+        elif all(type(v) is float for v in values):
+            columns[column] = array("d", values)
+    columns["trait_mask"] = array("q", [_mask(row.get("traits", []), trait_bits) for row in rows])
+    columns["allergen_mask"] = array("q", [_mask(row.get("allergens", []), allergen_bits) for row in rows])
+    columns["is_default"] = array("q", [int(row.get("convenience_score") == 1) for row in rows])
+
+    # Column fields keep a null placeholder in the blob so rows come back in their original key order
+    blobs = [json.dumps({k: None if k in columns else v for k, v in row.items()}).encode("utf-8") for row in rows]
+    blob_offsets = array("q", [0])
+    for blob in blobs:
+        blob_offsets.append(blob_offsets[-1] + len(blob))
+    columns["blob_offsets"] = blob_offsets
+
+    layout = {}
+    offset = 0
+    for name, values in columns.items():
+        layout[name] = {"typecode": values.typecode, "offset": offset, "length": len(values)}
+        offset += len(values) * values.itemsize
+    metadata = {
+        "rows": len(rows),
+        "groups": groups,
+        "allergen_bits": allergen_bits,
+        "columns": layout,
+        "blob_offset": offset,
+        "documents_offset": offset + blob_offsets[-1],
+    }
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    padding = b"\0" * (-(HEADER.size + len(metadata_bytes)) % 8)  # keep the arrays 8-byte aligned
+    return b"".join([
+        HEADER.pack(MAGIC, len(metadata_bytes) + len(padding)),
+        metadata_bytes,
+        padding,
+        *(values.tobytes() for values in columns.values()),
+        *blobs,
+        *documents,
+    ])
+
+
+def publish_snapshot(menus, directory=SNAPSHOT_DIR):
+    """
+    Writes a new snapshot generation and atomically makes it the live one.
+    Workers mapping an older generation switch on their next read.
+    Returns:
+        int: The new generation number.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # one writer at a time across processes
+        generation = _read_generation(directory) + 1
+        data = build_snapshot(menus)
+
+        snapshot_path = directory / f"menu.{generation}.snap"
+        tmp_path = snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+
+        pointer_tmp = directory / f"{POINTER_NAME}.tmp"
+        with open(pointer_tmp, "w") as f:
+            f.write(str(generation))
+        os.replace(pointer_tmp, directory / POINTER_NAME)
+
+        # Old generations can be unlinked even while mapped; their pages live until unmapped
+        for old_path in directory.glob("menu.*.snap"):
+            if int(old_path.suffixes[0][1:]) <= generation - KEEP_GENERATIONS:
+                old_path.unlink(missing_ok=True)
+    return generation
+
+
+def _read_generation(directory):
+    try:
+        with open(Path(directory) / POINTER_NAME, "r") as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+class MenuSnapshot:
+    """
+    Read-only, memory-mapped view of one snapshot generation, with the same read methods as MenuStore.
+    Numeric columns are zero-copy memoryviews over the shared mapping. A generation never changes,
+    so each row is decoded at most once per process and handed out as a copy.
+    """
+
+    def __init__(self, path, generation):
+        self.directory = Path(path).parent
+        self.generation = generation
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, metadata_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a menu snapshot")
+        data_start = HEADER.size + metadata_length
+        self.metadata = json.loads(self._mmap[HEADER.size:data_start].rstrip(b"\0"))
+        view = memoryview(self._mmap)
+        self.columns = {}
+        for name, column in self.metadata["columns"].items():
+            start = data_start + column["offset"]
+            itemsize = array(column["typecode"]).itemsize
+            self.columns[name] = view[start:start + column["length"] * itemsize].cast(column["typecode"])
+        self._blob_start = data_start + self.metadata["blob_offset"]
+        self._documents_start = data_start + self.metadata["documents_offset"]
+        self._row_columns = [column for column in NUMERIC_COLUMNS if column in self.columns]
+        self._decoded = {}  # row index -> decoded row
+
+    def get_loaded_menu(self, dining_hall_id, menu_date):
+        """
+        Returns {"version", "loaded_at"} of a menu in this snapshot, or None if it isn't in it.
+        """
+        group = self.metadata["groups"].get(f"{menu_date}|{dining_hall_id}")
+        return {"version": group["version"], "loaded_at": group["loaded_at"]} if group else None
+
+    def _row(self, i):
+        row = self._decoded.get(i)
+        if row is None:
+            offsets = self.columns["blob_offsets"]
+            row = json.loads(self._mmap[self._blob_start + offsets[i]:self._blob_start + offsets[i + 1]])
+            for column in self._row_columns:
+                if column in row:
+                    row[column] = self.columns[column][i]
+            self._decoded[i] = row
+        return dict(row)  # callers (the solver) add fields to the rows they get
+
+    def _rows(self, dining_hall_id, meal_period, menu_date, keep):
+        group = self.metadata["groups"].get(f"{menu_date}|{dining_hall_id}")
+        if not group or meal_period.lower() not in group["meal_periods"]:
+            return []
+        start, end = group["meal_periods"][meal_period.lower()]
+        return [self._row(i) for i in range(start, end) if keep(i)]
+
+    def fetch_menu_items(self, dining_hall_id, meal_period, menu_date, traits=[], allergens=[]):
+        """
+        Same result as query.fetch_menu_items: items having every trait and none of the allergens.
+        """
+        if any(trait not in TRAITS for trait in traits):
+            return []
+        required = _mask(traits, {trait: bit for bit, trait in enumerate(TRAITS)})
+        excluded = _mask(allergens, self.metadata["allergen_bits"])
+        trait_masks, allergen_masks = self.columns["trait_mask"], self.columns["allergen_mask"]
+        return self._rows(
+            dining_hall_id, meal_period, menu_date,
+            lambda i: trait_masks[i] & required == required and not allergen_masks[i] & excluded,
+        )
+
+    def get_default_menu(self, dining_hall_id, meal_period, menu_date):
+        is_default = self.columns["is_default"]
+        return self._rows(dining_hall_id, meal_period, menu_date, lambda i: is_default[i])
+
+    def get_default_menu_document(self, dining_hall_id, meal_period, menu_date):
+        """
+        Returns the pre-serialized default menu (JSON bytes), like MenuStore.get_default_menu_document.
+        """
+        group = self.metadata["groups"].get(f"{menu_date}|{dining_hall_id}")
+        if not group:
+            return None
+        if meal_period.lower() not in group["default_menus"]:
+            return b"[]"
+        start, end = group["default_menus"][meal_period.lower()]
+        return self._mmap[self._documents_start + start:self._documents_start + end]
+
+
+_snapshot = None
+_snapshot_checked = (None, 0.0)  # (directory, time.monotonic() of the last look at its pointer)
+
+def get_menu_snapshot(directory=SNAPSHOT_DIR):
+    """
+    Returns this process's mapping of the live snapshot generation, remapping when a newer
+    generation has been published (looked for at most every SNAPSHOT_CHECK_INTERVAL seconds).
+    Returns None if no snapshot exists yet.
+    """
+    global _snapshot, _snapshot_checked
+    directory = Path(directory)
+    now = time.monotonic()
+    checked_directory, checked_at = _snapshot_checked
+    if checked_directory == directory and now - checked_at < SNAPSHOT_CHECK_INTERVAL:
+        return _snapshot
+    _snapshot_checked = (directory, now)
+
+    generation = _read_generation(directory)
+    if generation == 0:
+        _snapshot = None
+        return None
+    if _snapshot is None or _snapshot.generation != generation or _snapshot.directory != directory:
+        try:
+            _snapshot = MenuSnapshot(directory / f"menu.{generation}.snap", generation)
+        except FileNotFoundError:
+            pass  # superseded while we were switching; keep the previous mapping until the next check
+    return _snapshot
+
+
+def refresh_snapshot(store, min_date=None):
+    """
+    Rebuilds the shared snapshot from the local menu store (menus from `min_date`, default today, onwards).
+    Readers fall back to the store while the snapshot is missing or stale, so failures are only logged.
+    Request handlers use schedule_snapshot_refresh instead, so they never wait for a rebuild.
+    Returns:
+        int: The new generation number, or None if the snapshot could not be written.
+    """
+    try:
+        return publish_snapshot(store.export_menus(min_date or get_today_est()))
+    except Exception as e:
+        print(f"Could not refresh the menu snapshot: {e}")
+        return None
+
+
+_refresh_requested = threading.Event()
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+_refresh_store = None
+
+def schedule_snapshot_refresh(store):
+    """
+    Rebuilds the snapshot from `store` in a background thread and returns at once.
+    Writes within SNAPSHOT_REFRESH_DELAY of each other share one rebuild; until it lands,
+    readers keep using the previous generation or fall back to the store.
+    """
+    global _refresh_thread, _refresh_store
+    with _refresh_lock:
+        _refresh_store = store
+        _refresh_requested.set()
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=_refresh_worker, name="menu-snapshot-refresh", daemon=True)
+            _refresh_thread.start()
+
+def _refresh_worker():
+    while True:
+        _refresh_requested.wait()
+        time.sleep(SNAPSHOT_REFRESH_DELAY)  # let a burst of writes land first
+        _refresh_requested.clear()
+        refresh_snapshot(_refresh_store)
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from app.prepare import TRAITS
+from app.utils import get_retention_cutoff
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STORE_PATH = Path(os.environ.get("MENU_STORE_PATH", BASE_DIR / ".cache" / "menu.sqlite3"))
+MAX_ALLERGENS = 62  # allergen bits must fit in a signed 64-bit SQLite integer
+# Bump when SCHEMA changes; older stores are dropped and reloaded from Supabase (the store is only a replica)
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS menu_items (
+    row_key INTEGER PRIMARY KEY,
+    id INTEGER NOT NULL, -- the Supabase row id, or the row's position for menus never published there
+    date TEXT NOT NULL,
+    dining_hall_id INTEGER NOT NULL,
+    meal_period TEXT NOT NULL,
+    convenience_score INTEGER,
+    trait_mask INTEGER NOT NULL,
+    allergen_mask INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS menu_items_lookup_idx
+    ON menu_items (date, dining_hall_id, meal_period, convenience_score);
+CREATE INDEX IF NOT EXISTS menu_items_mask_idx
+    ON menu_items (date, dining_hall_id, meal_period, trait_mask, allergen_mask);
+
+CREATE TABLE IF NOT EXISTS default_menus (
+    date TEXT NOT NULL,
+    dining_hall_id INTEGER NOT NULL,
+    meal_period TEXT NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (date, dining_hall_id, meal_period)
+);
+
+CREATE TABLE IF NOT EXISTS allergen_bits (
+    name TEXT PRIMARY KEY,
+    bit INTEGER NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS loaded_menus (
+    date TEXT NOT NULL,
+    dining_hall_id INTEGER NOT NULL,
+    version TEXT,
+    loaded_at REAL NOT NULL,
+    PRIMARY KEY (date, dining_hall_id)
+);
+
+CREATE TABLE IF NOT EXISTS dining_halls (
+    position INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def trait_mask(traits):
+    return sum(1 << i for i, trait in enumerate(TRAITS) if trait in traits)
+
+
+def serialize_menu(rows):
+    """
+    Serializes menu rows exactly as the API's JSON responses do (compact separators, UTF-8).
+    """
+    return json.dumps(rows, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def build_default_menus(rows):
+    """
+    Pre-serializes the default menu (convenience_score == 1 rows, ordered by id) of every meal period.
+    Returns:
+        dict: {meal_period: JSON bytes}
+    """
+    by_meal_period = {}
+    for row in sorted(rows, key=lambda row: row["id"]):
+        by_meal_period.setdefault(row["meal_period"].lower(), [])
+        if row.get("convenience_score") == 1:
+            by_meal_period[row["meal_period"].lower()].append(row)
+    return {meal_period: serialize_menu(menu) for meal_period, menu in by_meal_period.items()}
+
+
+class MenuStore:
+    """
+    Embedded SQLite copy of the published menus, used as a local read replica by the API.
+
+    Each hall/date menu is replaced in a single transaction, so readers see either the
+    old or the new menu. Traits and allergens are stored as bitmasks so filters are
+    indexed integer comparisons instead of JSON containment checks.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(
+                    "DROP TABLE IF EXISTS menu_items; DROP TABLE IF EXISTS default_menus; DROP TABLE IF EXISTS loaded_menus;"
+                )
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads, so each thread gets its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _allergen_bits(self, conn, allergens, create=False):
+        bits = dict(conn.execute("SELECT name, bit FROM allergen_bits").fetchall())
+        for allergen in allergens:
+            if allergen not in bits and create:
+                if len(bits) >= MAX_ALLERGENS:
+                    raise ValueError(f"More than {MAX_ALLERGENS} distinct allergens, cannot store {allergen!r}")
+                bits[allergen] = len(bits)
+                conn.execute("INSERT INTO allergen_bits (name, bit) VALUES (?, ?)", (allergen, bits[allergen]))
+        return bits
+
+    def replace_hall_menu(self, rows, dining_hall_id, menu_date, version=None):
+        """
+        Atomically replaces the stored menu of one hall for one date, and prunes menus dated
+        before the retention cutoff.
+        Rows keep their Supabase `id`; rows without one (never published there) are numbered
+        after the highest id of the menu, so ids stay unique within it.
+        """
+        next_id = max((row["id"] for row in rows if row.get("id") is not None), default=0) + 1
+        ids = []
+        for row in rows:
+            if row.get("id") is None:
+                ids.append(next_id)
+                next_id += 1
+            else:
+                ids.append(row["id"])
+        with self._write_lock, self._connect() as conn:
+            bits = self._allergen_bits(conn, {a for row in rows for a in row.get("allergens", [])}, create=True)
+            self._prune(conn, get_retention_cutoff())
+            conn.execute("DELETE FROM menu_items WHERE date = ? AND dining_hall_id = ?", (menu_date, dining_hall_id))
+            conn.executemany(
+                "INSERT INTO menu_items (id, date, dining_hall_id, meal_period, convenience_score, trait_mask, allergen_mask, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        item_id,
+                        menu_date,
+                        dining_hall_id,
+                        row["meal_period"].lower(),
+                        row.get("convenience_score"),
+                        trait_mask(row.get("traits", [])),
+                        sum(1 << bits[a] for a in set(row.get("allergens", []))),
+                        json.dumps({k: v for k, v in row.items() if k != "id"}),
+                    )
+                    for item_id, row in zip(ids, rows)
+                ],
+            )
+            # Materialize the default menus from the stored rows, so they carry the same ids and fields as reads
+            stored = conn.execute(
+                "SELECT id, data FROM menu_items WHERE date = ? AND dining_hall_id = ?", (menu_date, dining_hall_id)
+            ).fetchall()
+            default_menus = build_default_menus([{"id": item_id, **json.loads(data)} for item_id, data in stored])
+            conn.execute("DELETE FROM default_menus WHERE date = ? AND dining_hall_id = ?", (menu_date, dining_hall_id))
+            conn.executemany(
+                "INSERT INTO default_menus (date, dining_hall_id, meal_period, body) VALUES (?, ?, ?, ?)",
+                [(menu_date, dining_hall_id, meal_period, body) for meal_period, body in default_menus.items()],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO loaded_menus (date, dining_hall_id, version, loaded_at) VALUES (?, ?, ?, ?)",
+                (menu_date, dining_hall_id, version, time.time()),
+            )
+
+    def _prune(self, conn, min_date):
+        # Every menu table is keyed by date first, so these are index range deletes
+        for table in ("menu_items", "default_menus", "loaded_menus"):
+            conn.execute(f"DELETE FROM {table} WHERE date < ?", (min_date,))
+
+    def get_loaded_menu(self, dining_hall_id, menu_date):
+        """
+        Returns {"version", "loaded_at"} for a stored hall/date menu, or None if it was never loaded.
+        """
+        row = self._connect().execute(
+            "SELECT version, loaded_at FROM loaded_menus WHERE date = ? AND dining_hall_id = ?",
+            (menu_date, dining_hall_id),
+        ).fetchone()
+        return {"version": row[0], "loaded_at": row[1]} if row else None
+
+    def touch_menu(self, dining_hall_id, menu_date):
+        """
+        Marks a stored menu as freshly checked against the source.
+        """
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE loaded_menus SET loaded_at = ? WHERE date = ? AND dining_hall_id = ?",
+                (time.time(), menu_date, dining_hall_id),
+            )
+
+    def _select(self, where, params):
+        rows = self._connect().execute(f"SELECT id, data FROM menu_items WHERE {where} ORDER BY id, row_key", params).fetchall()
+        return [{"id": item_id, **json.loads(data)} for item_id, data in rows]
+
+    def fetch_menu_items(self, dining_hall_id, meal_period, menu_date, traits=[], allergens=[]):
+        """
+        Same result as query.fetch_menu_items: items having every trait and none of the allergens.
+        """
+        if any(trait not in TRAITS for trait in traits):
+            return []  # no stored item can carry an unknown trait
+        required = trait_mask(traits)
+        bits = self._allergen_bits(self._connect(), allergens)
+        excluded = sum(1 << bits[a] for a in set(allergens) if a in bits)
+        return self._select(
+            "date = ? AND dining_hall_id = ? AND meal_period = ? AND (trait_mask & ?) = ? AND (allergen_mask & ?) = 0",
+            (menu_date, dining_hall_id, meal_period.lower(), required, required, excluded),
+        )
+
+    def get_default_menu(self, dining_hall_id, meal_period, menu_date):
+        return self._select(
+            "date = ? AND dining_hall_id = ? AND meal_period = ? AND convenience_score = 1",
+            (menu_date, dining_hall_id, meal_period.lower()),
+        )
+
+    def get_default_menu_document(self, dining_hall_id, meal_period, menu_date):
+        """
+        Returns the pre-serialized default menu (JSON bytes) of a stored hall/date menu.
+        Meal periods the menu doesn't have serialize as an empty list.
+        """
+        row = self._connect().execute(
+            "SELECT body FROM default_menus WHERE date = ? AND dining_hall_id = ? AND meal_period = ?",
+            (menu_date, dining_hall_id, meal_period.lower()),
+        ).fetchone()
+        if row:
+            return row[0]
+        # Menus stored before default menus were materialized have no document yet
+        return serialize_menu(self.get_default_menu(dining_hall_id, meal_period, menu_date))
+
+    def export_menus(self, min_date):
+        """
+        Returns every stored menu dated `min_date` or later as
+        [{"date", "dining_hall_id", "version", "loaded_at", "rows"}, ...], rows ordered by meal period.
+        """
+        conn = self._connect()
+        menus = []
+        loaded = conn.execute(
+            "SELECT date, dining_hall_id, version, loaded_at FROM loaded_menus WHERE date >= ? ORDER BY date, dining_hall_id", (min_date,)
+        ).fetchall()
+        for menu_date, dining_hall_id, version, loaded_at in loaded:
+            rows = conn.execute(
+                "SELECT id, data FROM menu_items WHERE date = ? AND dining_hall_id = ? ORDER BY meal_period, id",
+                (menu_date, dining_hall_id),
+            ).fetchall()
+            menus.append({
+                "date": menu_date,
+                "dining_hall_id": dining_hall_id,
+                "version": version,
+                "loaded_at": loaded_at,
+                "rows": [{"id": item_id, **json.loads(data)} for item_id, data in rows],
+            })
+        return menus
+
+    def replace_dining_halls(self, halls):
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM dining_halls")
+            conn.executemany("INSERT INTO dining_halls (position, data) VALUES (?, ?)", [(i, json.dumps(h)) for i, h in enumerate(halls)])
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('dining_halls_loaded_at', ?)", (str(time.time()),))
+            digest = hashlib.sha1(json.dumps(halls, sort_keys=True).encode("utf-8")).hexdigest()
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('dining_halls_digest', ?)", (digest,))
+
+    def get_dining_halls(self):
+        """
+        Returns (halls, loaded_at); loaded_at is None if the halls were never stored.
+        """
+        conn = self._connect()
+        loaded_at = conn.execute("SELECT value FROM store_meta WHERE key = 'dining_halls_loaded_at'").fetchone()
+        halls = [json.loads(data) for (data,) in conn.execute("SELECT data FROM dining_halls ORDER BY position")]
+        return halls, float(loaded_at[0]) if loaded_at else None
+
+    def get_dining_halls_digest(self):
+        """
+        Returns (digest of the stored halls, loaded_at) without loading them; (None, None) if never stored.
+        """
+        meta = dict(self._connect().execute(
+            "SELECT key, value FROM store_meta WHERE key IN ('dining_halls_digest', 'dining_halls_loaded_at')"
+        ).fetchall())
+        loaded_at = meta.get("dining_halls_loaded_at")
+        return meta.get("dining_halls_digest"), float(loaded_at) if loaded_at else None
+
+
+_menu_store = None
+_menu_store_lock = threading.Lock()
+
+def get_menu_store():
+    """
+    Returns the process-wide menu store, opening it on first use.
+    """
+    global _menu_store
+    with _menu_store_lock:
+        if _menu_store is None:
+            _menu_store = MenuStore()
+        return _menu_store
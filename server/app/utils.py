@@ -1,9 +1,25 @@
 import json
 import os
 from pathlib import Path
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = Path(__file__).resolve().parent
 CONFIG_PATH = BASE_DIR / "config" / "halls.json"
+# Days of past menus kept in Supabase and in the local menu store
+MENU_RETENTION_DAYS = int(os.environ.get("MENU_RETENTION_DAYS", 7))
+
+def get_today_est():
+    """
+    Returns today's date in Ann Arbor (EST/EDT) as an ISO string, the key menus are stored under.
+    """
+    return datetime.now(ZoneInfo("America/New_York")).date().isoformat()
+
+def get_retention_cutoff():
+    """
+    Returns the oldest ISO date whose menus are kept.
+    """
+    return (date.fromisoformat(get_today_est()) - timedelta(days=MENU_RETENTION_DAYS)).isoformat()
 
 def get_configured_halls():
     with open(CONFIG_PATH, "r") as f:
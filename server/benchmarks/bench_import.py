@@ -0,0 +1,90 @@
+"""
+Measures API cold start: the time to import app.main in a fresh interpreter, and which modules it loads.
+
+Every run starts a new Python process, so nothing is reused from earlier imports. The
+environment only needs SUPABASE_PROJECT_URL / SUPABASE_ANON_API_KEY set (any value), since
+clients are created on first use rather than at import.
+
+Usage (from server/):
+    python -m benchmarks.bench_import [--repeat N] [--module app.main] [--top N] [--max-ms MS]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# Modules the API should not pull in at import time
+HEAVY_MODULES = ["pulp", "supabase", "groq", "instructor", "playwright"]
+
+TIMING_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+
+def time_import(module):
+    """
+    Imports `module` in a fresh interpreter.
+    Returns:
+        tuple: (seconds, heavy modules that got loaded)
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", TIMING_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+    )
+    elapsed, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return elapsed, loaded
+
+
+def top_imports(module, top):
+    """
+    Returns the `top` slowest modules imported directly by `module` as [(cumulative microseconds, module name)],
+    from -X importtime (which indents each nesting level by two more spaces).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and name.startswith("   ") and not name.startswith("    "):
+            entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to time (median is reported).")
+    parser.add_argument("--module", default="app.main", help="Module to import (default: %(default)s).")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list.")
+    parser.add_argument("--max-ms", type=float, help="Exit with an error if the median import time exceeds this.")
+    args = parser.parse_args(argv)
+
+    timings = []
+    for _ in range(args.repeat):
+        elapsed, loaded = time_import(args.module)
+        timings.append(elapsed)
+    median = statistics.median(timings)
+    print(f"import {args.module}: median {median * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms over {args.repeat} runs")
+    print(f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+    print(f"slowest imports under {args.module}:")
+    for cumulative, name in top_imports(args.module, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.max_ms is not None and median * 1000 > args.max_ms:
+        raise SystemExit(f"Import time {median * 1000:.1f} ms is over the {args.max_ms:.1f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmarks app.prepare.prepare_solver_data against the reference implementation on app/data/*.json.
+
+Usage (from server/):
+    python -m benchmarks.bench_prepare [--repeat N]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from app.prepare import prepare_solver_data
+from benchmarks import reference_prepare
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+DATA_DIR = APP_DIR / "data"
+AI_OUTPUT_PATH = APP_DIR / "data2" / "ai_test.json"
+
+
+def synthetic_offerings(items):
+    """
+    Stand-in AI output for stations without a saved grouping: every item on its own plus one bundle of everything.
+    """
+    offerings = [{"name": item, "items": [item], "service_style": "self_serve", "reasoning": ""} for item in items]
+    if len(items) > 1:
+        offerings.append({"name": "Full Plate", "items": list(items), "service_style": "bundle", "reasoning": ""})
+    return offerings
+
+
+def load_cases():
+    """
+    Returns [(raw_scraper_items, ai_offerings, station_name, meal_period, dining_hall_id), ...] for every station in app/data.
+    """
+    with open(AI_OUTPUT_PATH, "r") as f:
+        saved_groupings = json.load(f)
+
+    cases = []
+    for hall_id, file_path in enumerate(sorted(DATA_DIR.glob("*.json")), start=1):
+        with open(file_path, "r") as f:
+            menu = json.load(f)
+        for meal_period, stations in menu.items():
+            for station_name, items in stations.items():
+                saved = saved_groupings.get(station_name, {}).get("offerings")
+                # Saved groupings only apply if they reference this menu's items
+                if not saved or any(item not in items for offering in saved for item in offering["items"]):
+                    saved = synthetic_offerings(list(items))
+                cases.append((items, saved, station_name, meal_period, hall_id))
+    return cases
+
+
+def normalize(rows):
+    # Traits and allergens are built from sets, so compare them order-independently
+    return [{**row, "traits": sorted(row["traits"]), "allergens": sorted(row["allergens"])} for row in rows]
+
+
+def time_implementation(fn, cases, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for case in cases:
+            fn(*case)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Timed passes over all stations (best is reported).")
+    args = parser.parse_args(argv)
+
+    cases = load_cases()
+    for case in cases:
+        if normalize(prepare_solver_data(*case)) != normalize(reference_prepare.prepare_solver_data(*case)):
+            raise SystemExit(f"Mismatch for station {case[2]} ({case[3]})")
+    print(f"{len(cases)} stations: rows identical to the reference implementation.")
+
+    reference = time_implementation(reference_prepare.prepare_solver_data, cases, args.repeat)
+    optimized = time_implementation(prepare_solver_data, cases, args.repeat)
+    print(f"reference: {reference * 1000:.3f} ms per pass")
+    print(f"matrix:    {optimized * 1000:.3f} ms per pass ({reference / optimized:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Minimal stand-in for Groq's chat completions endpoint, for running the AI grouping without the real API.
+
+Answers POST /openai/v1/chat/completions. Every station in the prompt's TASK section gets one
+self-serve offering per item, so the groupings always match the scraped items; token usage is
+estimated from the message lengths. It can also add latency and answer a share of requests
+with 429 or 503, to exercise the rate limiter, retries and timeouts.
+
+Usage (from server/):
+    python -m benchmarks.fake_groq [--port 8765] [--latency-ms MS] [--fail-rate 0.2]
+
+Then point the scrape at it with GROQ_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import ast
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The station lines of ai.build_user_prompt and ai.build_batch_user_prompt
+STATION_PATTERN = re.compile(r'Input: Station "(.*?)" -> (\[.*\])')
+BATCH_STATION_PATTERN = re.compile(r'Input: Station id "(.*?)", Station ".*?" -> (\[.*\])')
+
+
+def group_items(items):
+    return {"offerings": [{"name": item, "items": [item], "service_style": "self_serve", "reasoning": "Component"} for item in items]}
+
+
+def answer(messages):
+    """
+    Returns the JSON content answering a grouping prompt: {"offerings"} for one station, {"stations"} for a batch.
+    """
+    task = messages[-1]["content"].split("TASK:", 1)[-1]
+    batch = BATCH_STATION_PATTERN.findall(task)
+    if batch:
+        return {"stations": {station_id: group_items(ast.literal_eval(items)) for station_id, items in batch}}
+    station = STATION_PATTERN.search(task)
+    return group_items(ast.literal_eval(station.group(2)) if station else [])
+
+
+class FakeGroq:
+    """
+    Completion logic plus the HTTP server answering it.
+    Statuses queued in `statuses` are returned (with an error body) by the next requests, before `fail_rate` applies.
+    """
+
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.statuses = []
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_status(self):
+        with self._lock:
+            self.requests += 1
+            if self.statuses:
+                return self.statuses.pop(0)
+            if self._random.random() < self.fail_rate:
+                return self._random.choice([429, 503])
+            return 200
+
+    def complete(self, request):
+        content = json.dumps(answer(request["messages"]))
+        prompt_tokens = sum(len(message.get("content") or "") for message in request["messages"]) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"fake-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status = fake.next_status()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if self.path != "/openai/v1/chat/completions":
+                    status, body = 404, {"error": {"message": "not found"}}
+                elif status != 200:
+                    body = {"error": {"message": f"fake error {status}", "type": "fake"}}
+                else:
+                    body = fake.complete(request)
+                payload = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out and hung up
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=8765):
+        """
+        Starts serving in a background thread and returns the server (call .shutdown() to stop it).
+        """
+        server = ThreadingHTTPServer((host, port), self.make_handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response, to mimic model latency.")
+    parser.add_argument("--fail-rate", type=float, default=0, help="Share of requests answered with 429 or 503.")
+    args = parser.parse_args(argv)
+
+    server = FakeGroq(latency=args.latency_ms / 1000, fail_rate=args.fail_rate).serve(args.host, args.port)
+    print(f"Fake Groq on http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Minimal stand-in for Supabase's PostgREST endpoint, for running the API without a database.
+
+Serves GET /rest/v1/<table> over tables held in memory, with the filters the app uses:
+eq, neq, is.null, cs and not.cs. Tables are seeded from the local menu store (menus,
+their versions and the dining halls) and/or a JSON file of {"table": [rows]}.
+
+Usage (from server/):
+    python -m benchmarks.fake_postgrest [--port 54321] [--from-store] [--data FILE] [--latency-ms MS]
+
+Then point the API at it with SUPABASE_PROJECT_URL=http://127.0.0.1:54321.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from app.store import get_menu_store
+
+
+def parse_array_literal(literal):
+    """
+    Parses a Postgres array literal such as {"Gluten Free",Vegan} into a list of strings.
+    """
+    values, current, quoted, escaped = [], "", False, False
+    for char in literal.strip()[1:-1]:
+        if escaped:
+            current += char
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            values.append(current)
+            current = ""
+        else:
+            current += char
+    if current or values:
+        values.append(current)
+    return values
+
+
+def matches(row, column, condition):
+    negate = condition.startswith("not.")
+    if negate:
+        condition = condition[len("not."):]
+    operator, _, value = condition.partition(".")
+    actual = row.get(column)
+    if operator == "eq":
+        result = str(actual) == value
+    elif operator == "neq":
+        result = str(actual) != value
+    elif operator == "is":
+        result = actual is None if value == "null" else str(actual).lower() == value
+    elif operator == "cs":
+        result = set(parse_array_literal(value)) <= set(actual or [])
+    else:
+        raise ValueError(f"Unsupported filter operator: {operator}")
+    return result != negate
+
+
+class FakePostgrest:
+    """
+    In-memory tables plus the HTTP server answering PostgREST selects over them.
+    """
+
+    def __init__(self, tables=None, latency=0.0):
+        self.tables = tables or {}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def select(self, table, params):
+        rows = self.tables.get(table)
+        if rows is None:
+            return 404, {"message": f"relation \"public.{table}\" does not exist"}
+        columns = "*"
+        for column, condition in params:
+            if column == "select":
+                columns = condition
+                continue
+            rows = [row for row in rows if matches(row, column, condition)]
+        if columns != "*":
+            rows = [{column: row.get(column) for column in columns.split(",")} for row in rows]
+        return 200, rows
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if not url.path.startswith("/rest/v1/"):
+                    status, body = 404, {"message": "not found"}
+                else:
+                    try:
+                        status, body = fake.select(url.path[len("/rest/v1/"):], parse_qsl(url.query, keep_blank_values=True))
+                    except ValueError as e:
+                        status, body = 400, {"message": str(e)}
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=54321):
+        """
+        Starts serving in a background thread and returns the server (call .shutdown() to stop it).
+        """
+        server = ThreadingHTTPServer((host, port), self.make_handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def tables_from_store(store, min_date="0000-00-00"):
+    """
+    Builds the menu_items, menu_versions and daily_hall_status tables from a local menu store.
+    """
+    tables = {"menu_items": [], "menu_versions": [], "daily_hall_status": store.get_dining_halls()[0]}
+    for menu in store.export_menus(min_date):
+        version = menu["version"]
+        for row in menu["rows"]:
+            tables["menu_items"].append({**row, "date": menu["date"], "menu_version": version})
+        if version is not None:
+            tables["menu_versions"].append({"dining_hall_id": menu["dining_hall_id"], "date": menu["date"], "version": version})
+    return tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--from-store", action="store_true", help="Seed the tables from the local menu store (MENU_STORE_PATH).")
+    parser.add_argument("--data", help="JSON file of {table: [rows]} to add to the tables.")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response, to mimic a remote database.")
+    args = parser.parse_args(argv)
+
+    tables = tables_from_store(get_menu_store()) if args.from_store else {}
+    if args.data:
+        with open(args.data, "r") as f:
+            for table, rows in json.load(f).items():
+                tables.setdefault(table, []).extend(rows)
+
+    fake = FakePostgrest(tables, latency=args.latency_ms / 1000)
+    server = fake.serve(args.host, args.port)
+    print(f"Fake PostgREST on http://{args.host}:{args.port} with {', '.join(f'{t} ({len(r)})' for t, r in tables.items()) or 'no tables'}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Load test for the API against local stand-ins, so it never touches production Supabase.
+
+Starts three processes: the fake PostgREST (benchmarks.fake_postgrest) seeded with today's menus
+prepared from app/data/*.json, the API under uvicorn pointed at it (with a fresh local menu store),
+and this load generator. Each endpoint is then driven in turn at the given concurrency:
+
+    /get-dining-halls, /menu (random hall and meal period), /optimize-meal (a seeded mix of
+    MealRequests: every hall and meal period, loose to tight constraints, random traits and allergens)
+
+and reported with throughput, latency percentiles, error rate and the CPU time the API used
+(read from /proc, summed over the uvicorn process and its workers).
+
+Usage (from server/):
+    python -m benchmarks.loadtest [--concurrency 16] [--duration 10] [--workers 1]
+        [--endpoints halls,menu,optimize] [--db-latency-ms 0] [--json OUT] [--verbose]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.utils import get_today_est
+from benchmarks.suite import TIGHTNESS, fixture_menus
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+REQUEST_SEED = 42
+TRAIT_CHOICES = [[], [], [], ["Vegetarian"], ["Vegan"], ["Gluten Free"], ["Halal"]]
+ALLERGEN_CHOICES = [[], [], [], ["milk"], ["eggs"], ["soy"], ["wheat/barley/rye"], ["milk", "eggs"]]
+
+
+def seed_tables(menu_date):
+    """
+    Builds the PostgREST tables from app/data: menu_items and menu_versions for `menu_date`, and daily_hall_status.
+    Returns:
+        tuple: (tables, {hall id: [meal periods]})
+    """
+    tables = {"menu_items": [], "menu_versions": [], "daily_hall_status": []}
+    meal_periods = {}
+    hall_ids = {}
+    for (hall, meal_period), offerings in sorted(fixture_menus().items()):
+        hall_id = hall_ids.setdefault(hall, offerings[0]["dining_hall_id"])
+        meal_periods.setdefault(hall_id, []).append(meal_period)
+        for row in offerings:
+            tables["menu_items"].append({**row, "date": menu_date, "menu_version": "loadtest"})
+    for hall, hall_id in hall_ids.items():
+        tables["menu_versions"].append({"dining_hall_id": hall_id, "date": menu_date, "version": "loadtest"})
+        tables["daily_hall_status"].append({"id": hall_id, "name": hall})
+    return tables, meal_periods
+
+
+def meal_requests(meal_periods, menu_date, count=200, seed=REQUEST_SEED):
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        hall_id = rng.choice(sorted(meal_periods))
+        requests.append({
+            "dining_hall_id": hall_id,
+            "meal_period": rng.choice(meal_periods[hall_id]),
+            "menu_date": menu_date,
+            "traits": rng.choice(TRAIT_CHOICES),
+            "allergens": rng.choice(ALLERGEN_CHOICES),
+            **TIGHTNESS[rng.choice(list(TIGHTNESS))],
+        })
+    return requests
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree_cpu_seconds(pid):
+    """
+    Returns user + system CPU seconds used by `pid` and its direct children (uvicorn workers), from /proc.
+    Includes the children's reaped processes, i.e. the CBC solver runs.
+    """
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for stat_path in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat_path.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue  # process exited while scanning
+        # After the command name: state, ppid, ..., then utime, stime, cutime and cstime are the 12th to 15th fields
+        proc_pid, ppid = int(stat_path.parent.name), int(fields[1])
+        if proc_pid == pid or ppid == pid:
+            total += sum(int(field) for field in fields[11:15]) / ticks
+    return total
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+async def drive(client, make_request, concurrency, duration):
+    """
+    Keeps `concurrency` requests in flight for `duration` seconds.
+    Returns:
+        tuple: (latencies in seconds, error count, elapsed seconds)
+    """
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    counter = 0
+
+    async def worker():
+        nonlocal errors, counter
+        while time.perf_counter() < deadline:
+            counter += 1
+            method, url, kwargs = make_request(counter)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_load(base_url, api_pid, endpoints, concurrency, duration, meal_periods, menu_date):
+    halls = sorted(meal_periods)
+    rng = random.Random(REQUEST_SEED)
+    optimize_requests = meal_requests(meal_periods, menu_date)
+
+    def menu_request(i):
+        hall_id = rng.choice(halls)
+        return "GET", "/menu", {"params": {"id": hall_id, "meal_period": rng.choice(meal_periods[hall_id]), "date": menu_date}}
+
+    scenarios = {
+        "halls": ("/get-dining-halls", lambda i: ("GET", "/get-dining-halls", {})),
+        "menu": ("/menu", menu_request),
+        "optimize": ("/optimize-meal", lambda i: ("POST", "/optimize-meal", {"json": optimize_requests[i % len(optimize_requests)]})),
+    }
+    report = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        for endpoint in endpoints:
+            path, make_request = scenarios[endpoint]
+            cpu_before = process_tree_cpu_seconds(api_pid)
+            latencies, errors, elapsed = await drive(client, make_request, concurrency, duration)
+            cpu = process_tree_cpu_seconds(api_pid) - cpu_before
+            latencies.sort()
+            report[path] = {
+                "requests": len(latencies),
+                "throughput_rps": len(latencies) / elapsed,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p90_ms": percentile(latencies, 90) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "max_ms": (latencies[-1] if latencies else 0) * 1000,
+                "error_rate": errors / len(latencies) if latencies else 0.0,
+                "cpu_seconds": cpu,
+                "cpu_percent": 100 * cpu / elapsed,
+            }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight per endpoint.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per endpoint.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes.")
+    parser.add_argument("--endpoints", default="halls,menu,optimize", help="Endpoints to drive, in order (default: %(default)s).")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="Latency the fake PostgREST adds to every call.")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the API's own output (warnings and errors).")
+    args = parser.parse_args(argv)
+
+    menu_date = get_today_est()
+    tables, meal_periods = seed_tables(menu_date)
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+        data_path = Path(tmp) / "tables.json"
+        data_path.write_text(json.dumps(tables))
+        db_port, api_port = free_port(), free_port()
+        try:
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.fake_postgrest", "--port", str(db_port), "--data", str(data_path),
+                 "--latency-ms", str(args.db_latency_ms)],
+                cwd=SERVER_DIR, stdout=subprocess.DEVNULL,
+            ))
+            wait_until_ready(f"http://127.0.0.1:{db_port}/rest/v1/daily_hall_status")
+
+            env = {
+                **os.environ,
+                "SUPABASE_PROJECT_URL": f"http://127.0.0.1:{db_port}",
+                "SUPABASE_ANON_API_KEY": "loadtest",
+                "MENU_STORE_PATH": str(Path(tmp) / "menu.sqlite3"),
+                "MENU_SNAPSHOT_DIR": str(Path(tmp) / "snapshot"),
+                "MENU_STORE_ONLY": "0",
+                "LOG_LEVEL": "WARNING",
+            }
+            api = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(api_port),
+                 "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+                cwd=SERVER_DIR, env=env, stderr=None if args.verbose else subprocess.DEVNULL,
+            )
+            processes.append(api)
+            base_url = f"http://127.0.0.1:{api_port}"
+            wait_until_ready(f"{base_url}/get-dining-halls")
+
+            endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+            report = asyncio.run(run_load(base_url, api.pid, endpoints, args.concurrency, args.duration, meal_periods, menu_date))
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    print(f"concurrency {args.concurrency}, {args.duration:g}s per endpoint, {args.workers} worker(s), db latency {args.db_latency_ms:g} ms")
+    print(f"{'endpoint':18s} {'requests':>8s} {'req/s':>8s} {'p50 ms':>8s} {'p90 ms':>8s} {'p99 ms':>8s} {'max ms':>8s} {'errors':>7s} {'CPU s':>7s} {'CPU %':>6s}")
+    for path, stats in report.items():
+        print(
+            f"{path:18s} {stats['requests']:8d} {stats['throughput_rps']:8.1f} {stats['p50_ms']:8.1f} {stats['p90_ms']:8.1f} "
+            f"{stats['p99_ms']:8.1f} {stats['max_ms']:8.1f} {stats['error_rate']:7.1%} {stats['cpu_seconds']:7.2f} {stats['cpu_percent']:6.0f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "endpoints": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Offline benchmark suite for the scrape -> prepare -> solve path, with a stored baseline to catch regressions.
+
+Benchmarks:
+    scrape/<page>               scrape_dining_hall on each saved page in app/offline_data (HTML parse included)
+    prepare/all_stations        prepare_solver_data over every station in app/data
+    solve/fixture/<hall>/<tightness>     execute_lp_solver on menus prepared from app/data
+    solve/synthetic_<n>/<tightness>      execute_lp_solver on synthetic menus of n offerings (100, 500, 2000)
+
+Each benchmark reports the best wall time of --repeat runs, peak Python memory (tracemalloc,
+measured in a separate untimed run), and for solves the number of solver iterations and menus found.
+Synthetic menus are generated from a fixed seed, so every run solves the same problems.
+
+Usage (from server/):
+    python -m benchmarks.suite [--repeat N] [--only PREFIX] [--sizes 100,500] [--baseline FILE] [--save-baseline]
+        [--tolerance 0.25] [--json OUT]
+
+With a baseline, benchmarks slower than baseline * (1 + tolerance), or using more memory by the same
+margin, are reported as regressions and the exit status is 1. Timings are machine dependent, so
+refresh the baseline (--save-baseline) when the benchmark machine changes. The full suite takes
+several minutes, mostly in the 2000-offering solves; use --only / --sizes for quick checks.
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+import pulp
+from bs4 import BeautifulSoup
+
+from app.lp import execute_lp_solver
+from app.prepare import prepare_solver_data
+from app.schemas import MealRequest
+from app.scraper import scrape_dining_hall
+from benchmarks.bench_prepare import load_cases
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+OFFLINE_DATA_DIR = APP_DIR / "offline_data"
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+SYNTHETIC_SIZES = [100, 500, 2000]
+SYNTHETIC_SEED = 1234
+
+# MealRequest constraints from loose to tight
+TIGHTNESS = {
+    "loose": {"calories_min": 500, "calories_max": 1600},
+    "medium": {"calories_min": 800, "calories_max": 1200, "protein_min": 40},
+    "tight": {"calories_min": 900, "calories_max": 1050, "protein_min": 60, "fat_max": 45, "carb_max": 120},
+}
+
+
+def measure(fn, repeat):
+    """
+    Runs `fn` `repeat` times for timing, then once under tracemalloc.
+    Returns:
+        dict: {"seconds": best wall time, "peak_kib": peak traced memory, "result": last return value}
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_kib": peak / 1024, "result": result}
+
+
+@contextlib.contextmanager
+def count_solves():
+    """
+    Counts pulp solve calls (solver iterations) made inside the block.
+    """
+    counter = {"solves": 0}
+    original = pulp.LpProblem.solve
+
+    def counting_solve(self, *args, **kwargs):
+        counter["solves"] += 1
+        return original(self, *args, **kwargs)
+
+    pulp.LpProblem.solve = counting_solve
+    try:
+        yield counter
+    finally:
+        pulp.LpProblem.solve = original
+
+
+def fixture_menus():
+    """
+    Builds solver offerings per (hall, meal period) from app/data, numbered like database ids.
+    Returns:
+        dict: {(hall name, meal period): [offering, ...]}
+    """
+    menus = {}
+    next_id = 1
+    hall_names = {hall_id: path.stem for hall_id, path in enumerate(sorted((APP_DIR / "data").glob("*.json")), start=1)}
+    for items, offerings, station_name, meal_period, hall_id in load_cases():
+        rows = prepare_solver_data(items, offerings, station_name, meal_period, hall_id)
+        menu = menus.setdefault((hall_names[hall_id], meal_period.lower()), [])
+        for row in rows:
+            menu.append({**row, "id": next_id})
+            next_id += 1
+    return menus
+
+
+def synthetic_menu(size, source_rows, seed=SYNTHETIC_SEED):
+    """
+    Returns `size` offerings resampled from real rows with jittered nutrients, about 15% of them bundles.
+    """
+    rng = random.Random(seed + size)
+    menu = []
+    for item_id in range(1, size + 1):
+        row = dict(rng.choice(source_rows))
+        jitter = rng.uniform(0.7, 1.3)
+        for column in ("calories_kcal", "protein_g", "total_carbohydrate_g", "total_fat_g", "sugars_g", "sodium_mg"):
+            row[column] = int(round((row.get(column) or 0) * jitter))
+        row["convenience_score"] = 5 if rng.random() < 0.15 else rng.choice([3, 1])
+        row["name"] = f"{row['name']} #{item_id}"
+        row["id"] = item_id
+        menu.append(row)
+    return menu
+
+
+def solve(offerings, tightness):
+    request = MealRequest(dining_hall_id=0, meal_period="lunch", **TIGHTNESS[tightness])
+    with count_solves() as counter, contextlib.redirect_stdout(io.StringIO()):
+        # The solver adds per-request fields to the offerings, so give it a copy
+        results = execute_lp_solver(request, [dict(o) for o in offerings])
+    return {"iterations": counter["solves"], "menus": len(results)}
+
+
+def collect_benchmarks(sizes):
+    """
+    Returns [(name, fn), ...]; fn returns an optional dict of extra counters.
+    """
+    benchmarks = []
+    for path in sorted(OFFLINE_DATA_DIR.glob("*.html")):
+        html = path.read_text()
+
+        def scrape(html=html, path=path):
+            with contextlib.redirect_stdout(io.StringIO()):
+                menu = scrape_dining_hall(BeautifulSoup(html, "html.parser"), url=str(path), name=path.stem)
+            return {"items": sum(len(items) for stations in menu.values() for items in stations.values())}
+        benchmarks.append((f"scrape/{path.stem}", scrape))
+
+    cases = load_cases()
+
+    def prepare():
+        return {"rows": sum(len(prepare_solver_data(*case)) for case in cases)}
+    benchmarks.append(("prepare/all_stations", prepare))
+
+    menus = fixture_menus()
+    for (hall, meal_period), offerings in sorted(menus.items()):
+        for tightness in TIGHTNESS:
+            benchmarks.append((f"solve/fixture/{hall}_{meal_period}/{tightness}", lambda o=offerings, t=tightness: solve(o, t)))
+
+    source_rows = [row for offerings in menus.values() for row in offerings]
+    for size in sizes:
+        offerings = synthetic_menu(size, source_rows)
+        for tightness in TIGHTNESS:
+            benchmarks.append((f"solve/synthetic_{size}/{tightness}", lambda o=offerings, t=tightness: solve(o, t)))
+    return benchmarks
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the regressions of `results` against `baseline` as printable strings.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("seconds", "peak_kib"):
+            if previous.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]:.4g} -> {current[metric]:.4g} (+{current[metric] / previous[metric] - 1:.0%})")
+        if "iterations" in previous and current.get("iterations") != previous["iterations"]:
+            regressions.append(f"{name}: solver iterations {previous['iterations']} -> {current.get('iterations')}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per benchmark (best is reported).")
+    parser.add_argument("--only", help="Run only benchmarks whose name starts with this prefix.")
+    parser.add_argument("--sizes", default=",".join(map(str, SYNTHETIC_SIZES)), help="Synthetic menu sizes (default: %(default)s).")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline to compare against (default: %(default)s).")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline instead of comparing.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown/memory growth before flagging (default: %(default)s).")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = {}
+    for name, fn in collect_benchmarks(sizes):
+        if args.only and not name.startswith(args.only):
+            continue
+        measured = measure(fn, args.repeat)
+        results[name] = {"seconds": measured["seconds"], "peak_kib": measured["peak_kib"], **(measured["result"] or {})}
+        extra = " ".join(f"{key}={value}" for key, value in (measured["result"] or {}).items())
+        print(f"{name:45s} {measured['seconds'] * 1000:10.2f} ms {measured['peak_kib']:10.1f} KiB  {extra}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline = {}
+        if baseline_path.exists():
+            with open(baseline_path, "r") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} results to {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one.")
+        return
+    with open(baseline_path, "r") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s) against {baseline_path}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise SystemExit(1)
+    print(f"No regressions against {baseline_path} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+-- Versioned menu publishing (see app.query.publish_hall_menu).
+-- Rows are written under a new menu_version and only become visible once
+-- menu_versions points the hall/date at that version.
+
+alter table menu_items add column if not exists menu_version text;
+
+create index if not exists menu_items_version_idx
+    on menu_items (menu_version, dining_hall_id, meal_period);
+
+create table if not exists menu_versions (
+    dining_hall_id bigint not null,
+    date date not null,
+    version text not null,
+    published_at timestamptz not null default now(),
+    primary key (dining_hall_id, date)
+);
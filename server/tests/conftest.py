@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+# Settings are read from the environment at import time, so point every on-disk cache and
+# external service at throwaway stand-ins before any app module is imported.
+_tmp = tempfile.mkdtemp(prefix="dining-app-tests-")
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("SUPABASE_PROJECT_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_ANON_API_KEY", "test")
+os.environ.setdefault("LLM_CACHE_DIR", os.path.join(_tmp, "llm"))
+os.environ.setdefault("SCRAPE_RUNS_DIR", os.path.join(_tmp, "runs"))
+os.environ.setdefault("MENU_STORE_PATH", os.path.join(_tmp, "menu.sqlite3"))
+os.environ.setdefault("MENU_SNAPSHOT_DIR", os.path.join(_tmp, "snapshot"))
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app import ai
+from app.ai import StationMenu, VirtualMeal
+from app.ratelimit import RateLimiter
+
+ITEMS = ["Pork Roast", "Rice"]
+
+
+def station_menu(*item_lists):
+    return StationMenu(offerings=[
+        VirtualMeal(name=" + ".join(items), items=items, service_style="bundle", reasoning="") for items in item_lists
+    ])
+
+
+@pytest.fixture
+def llm_responses(monkeypatch):
+    """
+    Replaces the LLM call with a queue of canned responses and returns the queue.
+    """
+    responses = []
+
+    async def fake_call(*args, **kwargs):
+        return responses.pop(0)
+
+    monkeypatch.setattr(ai, "call_llm_async", fake_call)
+    return responses
+
+
+def group(station_name):
+    return asyncio.run(ai.group_station_items_async(station_name, ITEMS, RateLimiter(), use_cache=False))
+
+
+def test_single_station_result_is_remapped_to_scraped_names(llm_responses):
+    llm_responses.append(station_menu(["pork roast", "RICE"]))
+
+    result = group("Remap Station")
+
+    assert result.offerings[0].items == ITEMS
+    cached = ai.get_llm_cache().get("Remap Station", ITEMS, ai.PROMPT_VERSION)
+    assert cached[0]["items"] == ITEMS
+
+
+def test_single_station_result_with_unknown_items_is_retried(llm_responses):
+    llm_responses.extend([station_menu(["Pork Roast", "Mashed Potatoes"]), station_menu(ITEMS)])
+
+    result = group("Retry Station")
+
+    assert result.offerings[0].items == ITEMS
+    assert not llm_responses
+
+
+def test_single_station_without_valid_result_raises_and_is_not_cached(llm_responses):
+    llm_responses.extend([station_menu(["Tofu"])] * ai.LLM_VALIDATION_ATTEMPTS)
+
+    with pytest.raises(ValueError):
+        group("Invalid Station")
+    assert ai.get_llm_cache().get("Invalid Station", ITEMS, ai.PROMPT_VERSION) is None
@@ -0,0 +1,101 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.prepare import NUTRIENTS
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("menu_date", ["tomorrow", "2026-13-01", "2026-10-19'; drop table menu_items"])
+def test_menu_rejects_invalid_dates(client, menu_date):
+    response = client.get("/menu", params={"id": 1, "meal_period": "lunch", "date": menu_date})
+    assert response.status_code == 422
+
+
+def test_optimize_meal_rejects_invalid_dates(client):
+    response = client.post("/optimize-meal", json={
+        "dining_hall_id": 1, "meal_period": "lunch", "calories_min": 500, "calories_max": 1000, "menu_date": "10/19/2026",
+    })
+    assert response.status_code == 422
+
+
+@pytest.fixture
+def store_only(tmp_path, monkeypatch):
+    from app import async_query, query
+    from app.store import MenuStore
+
+    store = MenuStore(tmp_path / "menu.sqlite3")
+    monkeypatch.setattr(async_query, "MENU_STORE_ONLY", True)
+    monkeypatch.setattr(async_query, "get_menu_store", lambda: store)
+    monkeypatch.setattr(query, "get_menu_store", lambda: store)
+    monkeypatch.setattr(query, "get_menu_snapshot", lambda: None)
+    return store
+
+
+def publish(store, version):
+    nutrients = {column: 10 for column, _ in NUTRIENTS}
+    store.replace_hall_menu([
+        {"id": 1, "name": "Toast", "meal_period": "lunch", "station": "Grill", "convenience_score": 1, "traits": [], "allergens": [], **nutrients},
+        {"id": 2, "name": "Burger", "meal_period": "lunch", "station": "Grill", "convenience_score": 5, "traits": [], "allergens": [], **nutrients, "calories_kcal": 500},
+    ], 1, "2026-10-19", version)
+
+
+def test_menu_is_revalidated_with_its_etag(client, store_only):
+    publish(store_only, "v1")
+    params = {"id": 1, "meal_period": "lunch", "date": "2026-10-19"}
+    response = client.get("/menu", params=params)
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()] == ["Toast"]  # the default menu
+    etag = response.headers["etag"]
+    assert "max-age" in response.headers["cache-control"]
+
+    not_modified = client.get("/menu", params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.content == b""
+
+    # A new menu version changes the ETag, so the old copy is refetched
+    publish(store_only, "v2")
+    response = client.get("/menu", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_menus_not_in_the_store_are_not_cached(client, store_only):
+    response = client.get("/menu", params={"id": 2, "meal_period": "lunch", "date": "2026-10-19"})
+    assert "etag" not in response.headers
+
+
+def test_gzip_and_identity_responses_vary_on_encoding(client, store_only):
+    publish(store_only, "v1")
+    params = {"id": 1, "meal_period": "lunch", "date": "2026-10-19"}
+    for encoding in ("gzip", "identity"):
+        response = client.get("/menu", params=params, headers={"Accept-Encoding": encoding})
+        assert response.headers["etag"].startswith('W/"')
+        assert "accept-encoding" in response.headers["vary"].lower()
+
+
+def optimize(client, headers):
+    return client.post("/optimize-meal", headers=headers, json={
+        "dining_hall_id": 1, "meal_period": "lunch", "calories_min": 100, "calories_max": 1000, "menu_date": "2026-10-19",
+    })
+
+
+def test_profiling_is_off_by_default(client, store_only):
+    publish(store_only, "v1")
+    assert "server-timing" not in optimize(client, {"X-Profile": "1"}).headers
+
+
+def test_server_timing_is_exposed_to_browsers_when_profiling_is_on(client, store_only, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "ALLOW_PROFILING", True)
+    publish(store_only, "v1")
+    response = optimize(client, {"X-Profile": "1", "Origin": main.origins[0]})
+    assert "fetch" in response.headers["server-timing"]
+    assert "server-timing" in response.headers["access-control-expose-headers"].lower()
@@ -0,0 +1,138 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app import daily_scrape
+from app.daily_scrape import run_daily_scrape, run_unit
+from app.manifest import MAX_UNIT_ATTEMPTS, RunManifest, DONE, FAILED
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(daily_scrape, "UNIT_RETRY_DELAY", 0)
+
+
+def counting(result=None, error=None):
+    """
+    Returns an async unit function that counts its calls and returns `result` or raises `error`.
+    """
+    async def fn():
+        fn.calls += 1
+        if error is not None:
+            raise error
+        return result
+    fn.calls = 0
+    return fn
+
+
+def test_rerun_resumes_failed_unit(tmp_path):
+    failing = counting(error=RuntimeError("publish failed"))
+    first_run = RunManifest("2026-10-19", directory=tmp_path)
+    assert asyncio.run(run_unit(first_run, "4|2026-10-19|publish", failing)) is None
+    assert failing.calls == MAX_UNIT_ATTEMPTS
+    assert first_run.units["4|2026-10-19|publish"]["status"] == FAILED
+
+    succeeding = counting(result="v2")
+    rerun = RunManifest("2026-10-19", directory=tmp_path)
+    assert asyncio.run(run_unit(rerun, "4|2026-10-19|publish", succeeding)) == "v2"
+    assert succeeding.calls == 1
+    assert rerun.units["4|2026-10-19|publish"]["status"] == DONE
+    assert rerun.summary()["failed"] == {}
+
+
+def test_successes_do_not_use_up_attempts(tmp_path):
+    manifest = RunManifest("2026-10-19", directory=tmp_path)
+    fetch = counting(result="<html>")
+    for _ in range(MAX_UNIT_ATTEMPTS + 2):
+        assert asyncio.run(run_unit(manifest, "4|2026-10-19|fetch", fetch, checkpoint=False)) == "<html>"
+    assert fetch.calls == MAX_UNIT_ATTEMPTS + 2
+
+
+def test_failed_meal_period_skips_its_hall_only(tmp_path, monkeypatch):
+    halls = [{"id": 1, "name": "Bursley"}, {"id": 4, "name": "South Quad"}]
+    jobs = [{"hall": hall, "menu_date": "2026-10-19", "source": hall["name"], "is_local": True} for hall in halls]
+    item = {"traits": [], "allergens": [], "nutrition": {}}
+
+    async def analyze(stations, limiter=None, return_exceptions=False, on_llm_call=None):
+        return {key: {"offerings": []} for key in stations}
+
+    def prepare(unit):
+        if unit["hall"]["id"] == 1 and unit["meal_period"] == "Dinner":
+            raise ValueError("bad nutrition data")
+        return [{"name": "Toast"}]
+
+    monkeypatch.setattr(daily_scrape, "get_html", lambda source, is_local: "<html></html>")
+    monkeypatch.setattr(daily_scrape, "scrape_dining_hall", lambda soup, url, name: {
+        "Lunch": {"Grill": {"Toast": item}}, "Dinner": {"Grill": {"Toast": item}},
+    })
+    monkeypatch.setattr(daily_scrape, "analyze_stations_async", analyze)
+    monkeypatch.setattr(daily_scrape, "prepare_meal_period", prepare)
+    published = []
+
+    def publish(rows, dining_hall_id, menu_date=None):
+        published.append(dining_hall_id)
+        return "v1"
+
+    manifest = RunManifest("2026-10-19", directory=tmp_path)
+    results = asyncio.run(run_daily_scrape(jobs, publish, manifest))
+
+    assert published == [4]
+    assert [result["hall"] for result in results] == ["South Quad"]
+    assert list(manifest.summary()["failed"]) == ["1|2026-10-19|Dinner|prepare"]
+
+
+def test_rerun_regroups_failed_station(tmp_path, monkeypatch):
+    hall = {"id": 4, "name": "South Quad"}
+    jobs = [{"hall": hall, "menu_date": "2026-10-19", "source": hall["name"], "is_local": True}]
+    item = {"traits": [], "allergens": [], "nutrition": {}}
+    station_key = "4|2026-10-19|Lunch|Grill"
+    analyzed = []
+    published = []
+
+    def analyzer(fail):
+        async def analyze(stations, limiter=None, return_exceptions=False, on_llm_call=None):
+            analyzed.extend(stations)
+            return {key: RuntimeError("LLM down") if fail else {"offerings": [{"name": "Toast"}]} for key in stations}
+        return analyze
+
+    def publish(rows, dining_hall_id, menu_date=None):
+        published.append(rows)
+        return f"v{len(published)}"
+
+    monkeypatch.setattr(daily_scrape, "get_html", lambda source, is_local: "<html></html>")
+    monkeypatch.setattr(daily_scrape, "scrape_dining_hall", lambda soup, url, name: {"Lunch": {"Grill": {"Toast": item}}})
+    monkeypatch.setattr(daily_scrape, "prepare_meal_period", lambda unit: [{"name": "Toast", "offerings": unit["analyses"]["Grill"]["offerings"]}])
+
+    # The station can't be grouped: the hall is still published with the raw items, but the run reports it
+    monkeypatch.setattr(daily_scrape, "analyze_stations_async", analyzer(fail=True))
+    first_run = RunManifest("2026-10-19", directory=tmp_path)
+    asyncio.run(run_daily_scrape(jobs, publish, first_run))
+    assert analyzed == ["Grill"] * MAX_UNIT_ATTEMPTS
+    assert published[-1] == [{"name": "Toast", "offerings": []}]
+    assert list(first_run.summary()["failed"]) == [station_key]
+
+    # A rerun regroups the station and republishes the hall
+    analyzed.clear()
+    monkeypatch.setattr(daily_scrape, "analyze_stations_async", analyzer(fail=False))
+    rerun = RunManifest("2026-10-19", directory=tmp_path)
+    results = asyncio.run(run_daily_scrape(jobs, publish, rerun))
+    assert analyzed == ["Grill"]
+    assert published[-1] == [{"name": "Toast", "offerings": [{"name": "Toast"}]}]
+    assert [result["version"] for result in results] == ["v2"]
+    assert rerun.units[station_key]["status"] == DONE
+    assert rerun.summary()["failed"] == {}
+
+
+def test_offline_jobs_use_each_halls_newest_page(tmp_path, monkeypatch):
+    for name in ["bursley_12_18_25.html", "bursley_01_05_26.html", "bursley_09_30_25.html", "southq_12_18_25.html"]:
+        (tmp_path / name).write_text("<html></html>")
+    halls = [{"name": "Bursley", "test_id": "bursley"}, {"name": "South Quad", "test_id": "southq"}, {"name": "Mojo", "test_id": "mojo"}]
+    monkeypatch.setattr(daily_scrape, "OFFLINE_DATA_DIR", tmp_path)
+    monkeypatch.setattr(daily_scrape, "get_configured_halls", lambda: halls)
+
+    jobs = daily_scrape.get_hall_jobs(offline=True, days=2)
+
+    assert [(job["hall"]["name"], Path(job["source"]).name) for job in jobs] == [
+        ("Bursley", "bursley_01_05_26.html"), ("South Quad", "southq_12_18_25.html"),
+    ] * 2
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+from app import http_cache
+from app.http_cache import cache_headers, etag_matches, make_etag
+
+
+def max_age(headers):
+    return int(headers["Cache-Control"].split("max-age=")[1].split(",")[0])
+
+
+def test_responses_before_the_scrape_expire_once_the_new_menus_are_served(monkeypatch):
+    monkeypatch.setattr(http_cache, "SCRAPE_TIME_UTC", "05:01")
+    monkeypatch.setattr(http_cache, "SCRAPE_DURATION", 1800)
+    monkeypatch.setattr(http_cache, "MENU_STORE_TTL", 300)
+    headers = cache_headers('"abc"', now=datetime(2026, 10, 19, 4, 1, tzinfo=timezone.utc))
+    # 05:01 plus 30 minutes of scraping plus 5 minutes for the local stores to re-check
+    assert max_age(headers) == 95 * 60
+    assert "must-revalidate" not in headers["Cache-Control"]
+
+
+def test_responses_during_the_scrape_are_cached_briefly(monkeypatch):
+    monkeypatch.setattr(http_cache, "SCRAPE_TIME_UTC", "05:01")
+    monkeypatch.setattr(http_cache, "SCRAPE_DURATION", 1800)
+    monkeypatch.setattr(http_cache, "MENU_STORE_TTL", 300)
+    for minute in (1, 20, 35):
+        headers = cache_headers('"abc"', now=datetime(2026, 10, 19, 5, minute, tzinfo=timezone.utc))
+        assert max_age(headers) == http_cache.MIN_MAX_AGE
+        assert "must-revalidate" in headers["Cache-Control"]
+
+    headers = cache_headers('"abc"', now=datetime(2026, 10, 19, 5, 40, tzinfo=timezone.utc))
+    assert max_age(headers) == 24 * 3600 - 4 * 60
+
+
+def test_etag_matching():
+    etag = make_etag("menu", 1, "2026-10-19", "lunch", "v1")
+    assert etag != make_etag("menu", 1, "2026-10-19", "lunch", "v2")
+    assert etag.startswith('W/"')
+    assert etag_matches(etag, etag)
+    # Weak comparison: a client may send the tag back with or without the W/ prefix
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
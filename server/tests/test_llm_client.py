@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import instructor
+import pytest
+from groq import AsyncGroq
+
+from app import ai
+from app.ai import StationMenu, build_user_prompt, call_llm_async
+from app.ratelimit import RateLimiter, TokenBucket
+from benchmarks.fake_groq import FakeGroq
+
+PROMPT = build_user_prompt("Grill", ["Burger", "Fries"])
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    """
+    Serves a FakeGroq on a free port and points the async LLM client at it, with no backoff between retries.
+    """
+    fake = FakeGroq()
+    server = fake.serve(port=0)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(ai, "async_client", instructor.from_groq(AsyncGroq(api_key="test", base_url=base_url, max_retries=0), mode=instructor.Mode.JSON))
+    monkeypatch.setattr(ai, "LLM_RETRY_WAIT", 0)
+    yield fake
+    server.shutdown()
+
+
+def call(on_call=None):
+    return asyncio.run(call_llm_async(ai.SYSTEM_PROMPT, PROMPT, StationMenu, RateLimiter(), on_call=on_call))
+
+
+def test_station_is_grouped_by_the_llm(fake_groq):
+    result = asyncio.run(ai.group_station_items_async("Grill", ["Burger", "Fries"], RateLimiter(), use_cache=False))
+    assert [offering.items for offering in result.offerings] == [["Burger"], ["Fries"]]
+    assert fake_groq.requests == 1
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_rate_limits_and_server_errors_are_retried(fake_groq, status):
+    fake_groq.statuses = [status, status]
+    calls = []
+    result = call(calls.append)
+
+    assert [offering.name for offering in result.offerings] == ["Burger", "Fries"]
+    assert fake_groq.requests == 3
+    assert calls[0]["attempts"] == 3
+    assert calls[0]["total_tokens"] > 0
+    assert "error" not in calls[0]
+
+
+def test_calls_give_up_after_the_last_attempt(fake_groq):
+    fake_groq.statuses = [503] * (ai.LLM_MAX_ATTEMPTS + 1)
+    calls = []
+    with pytest.raises(Exception):
+        call(calls.append)
+    assert fake_groq.requests == ai.LLM_MAX_ATTEMPTS
+    assert calls[0]["attempts"] == ai.LLM_MAX_ATTEMPTS
+    assert "error" in calls[0]
+
+
+def test_slow_calls_time_out(fake_groq, monkeypatch):
+    monkeypatch.setattr(ai, "LLM_TIMEOUT", 0.1)
+    monkeypatch.setattr(ai, "LLM_MAX_ATTEMPTS", 2)
+    fake_groq.latency = 0.5
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        call()
+    assert fake_groq.requests == 2
+    assert time.perf_counter() - start < 1
+
+
+def test_token_bucket_paces_requests_to_its_rate():
+    bucket = TokenBucket(600, capacity=1)  # 10 per second, no burst beyond the first
+
+    async def acquire(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    start = time.perf_counter()
+    asyncio.run(acquire(4))
+    assert 0.28 <= time.perf_counter() - start < 0.6
+
+
+def test_rate_limiter_waits_for_the_token_budget():
+    limiter = RateLimiter(rpm=6000, tpm=6000)  # 100 tokens per second
+
+    async def acquire():
+        await limiter.acquire(6000)  # the whole minute's budget
+        await limiter.acquire(20)
+
+    start = time.perf_counter()
+    asyncio.run(acquire())
+    assert 0.18 <= time.perf_counter() - start < 0.5
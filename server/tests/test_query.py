@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+from app import async_query, query
+from app.store import MenuStore
+
+
+class FakeTable:
+    """
+    Records the builder calls made on a Supabase table and answers execute() from `responses`.
+    """
+
+    def __init__(self, client, name):
+        self.client, self.name, self.calls = client, name, []
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            self.calls.append((method, args))
+            return self
+        return call
+
+    def execute(self):
+        self.client.executed.append((self.name, self.calls))
+        method = self.calls[0][0]
+        data = self.client.responses.get((self.name, method), [])
+        if method == "insert":
+            data = self.calls[0][1][0]
+        return SimpleNamespace(data=data, count=0)
+
+
+class FakeSupabase:
+    def __init__(self, responses):
+        self.responses = responses
+        self.executed = []
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def test_publish_keeps_the_replaced_version_until_the_next_publish(tmp_path, monkeypatch):
+    client = FakeSupabase({("menu_versions", "select"): [{"version": "v-old"}]})
+    monkeypatch.setattr(query, "get_supabase", lambda: client)
+    monkeypatch.setattr(query, "get_menu_store", lambda: MenuStore(tmp_path / "menu.sqlite3"))
+
+    version = query.publish_hall_menu([{"id": 1, "name": "Toast", "meal_period": "lunch"}], 4, "2026-10-19")
+
+    superseded = [calls for name, calls in client.executed if name == "menu_items" and calls[0][0] == "delete" and ("eq", ("date", "2026-10-19")) in calls]
+    assert superseded == [[
+        ("delete", ()),
+        ("eq", ("dining_hall_id", 4)),
+        ("eq", ("date", "2026-10-19")),
+        ("or_", (f"menu_version.is.null,menu_version.not.in.({version},v-old)",)),
+    ]]
+
+
+def reload(monkeypatch, tmp_path, pointers, rows_by_version):
+    store = MenuStore(tmp_path / "menu.sqlite3")
+    pointers = iter(pointers)
+
+    async def get_active_menu_version(dining_hall_id, menu_date):
+        return next(pointers)
+
+    async def select_menu_rows(dining_hall_id, menu_date, menu_version):
+        return rows_by_version.get(menu_version, [])
+
+    monkeypatch.setattr(async_query, "get_active_menu_version", get_active_menu_version)
+    monkeypatch.setattr(async_query, "select_menu_rows", select_menu_rows)
+    monkeypatch.setattr(async_query, "schedule_snapshot_refresh", lambda store: None)
+    return store, asyncio.run(async_query._reload_hall_menu(store, 4, "2026-10-19", None))
+
+
+def test_reload_follows_a_pointer_swapped_between_reads(tmp_path, monkeypatch):
+    rows = [{"id": 1, "name": "Toast", "meal_period": "lunch"}]
+    store, reader = reload(monkeypatch, tmp_path, ["v1", "v2"], {"v2": rows})
+
+    assert reader is store
+    assert store.get_loaded_menu(4, "2026-10-19")["version"] == "v2"
+    assert [item["name"] for item in store.fetch_menu_items(4, "lunch", "2026-10-19")] == ["Toast"]
+
+
+def test_reload_never_stores_an_empty_menu_for_a_version(tmp_path, monkeypatch):
+    store, reader = reload(monkeypatch, tmp_path, ["v1", "v1"], {})
+
+    assert reader is None
+    assert store.get_loaded_menu(4, "2026-10-19") is None
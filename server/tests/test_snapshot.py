@@ -0,0 +1,93 @@
+from app import query, snapshot
+from app.snapshot import get_menu_snapshot, publish_snapshot
+from app.store import MenuStore
+from app.utils import get_today_est
+
+
+def row(item_id, name, meal_period="lunch", convenience_score=1, traits=(), allergens=()):
+    return {
+        "id": item_id, "dining_hall_id": 1, "name": name, "meal_period": meal_period, "station": "Grill",
+        "convenience_score": convenience_score, "calories": 100.0 + item_id, "protein": 5.0,
+        "traits": list(traits), "allergens": list(allergens),
+    }
+
+
+ROWS = [
+    row(1, "Toast", traits=["Vegetarian"], allergens=["wheat/barley/rye"]),
+    row(2, "Eggs", convenience_score=2, traits=["Vegetarian", "Gluten Free"], allergens=["eggs"]),
+    row(3, "Rice", traits=["Vegan", "Vegetarian", "Gluten Free"]),
+    row(4, "Pancakes", meal_period="breakfast", allergens=["milk", "eggs"]),
+]
+
+
+def seeded_store(tmp_path, version="v1"):
+    store = MenuStore(tmp_path / "menu.sqlite3")
+    store.replace_hall_menu(ROWS, 1, get_today_est(), version)
+    return store
+
+
+def test_snapshot_reads_match_the_store(tmp_path):
+    store = seeded_store(tmp_path)
+    today = get_today_est()
+    publish_snapshot(store.export_menus(today), tmp_path / "snapshot")
+    menu_snapshot = get_menu_snapshot(tmp_path / "snapshot")
+
+    assert menu_snapshot.get_loaded_menu(1, today) == store.get_loaded_menu(1, today)
+    for meal_period in ("lunch", "breakfast", "dinner"):
+        for traits, allergens in [([], []), (["Vegetarian"], []), (["Gluten Free"], ["eggs"]), ([], ["wheat/barley/rye", "milk"])]:
+            assert menu_snapshot.fetch_menu_items(1, meal_period, today, traits, allergens) == store.fetch_menu_items(1, meal_period, today, traits, allergens)
+        assert menu_snapshot.get_default_menu(1, meal_period, today) == store.get_default_menu(1, meal_period, today)
+        assert bytes(menu_snapshot.get_default_menu_document(1, meal_period, today)) == store.get_default_menu_document(1, meal_period, today)
+    assert menu_snapshot.get_loaded_menu(2, today) is None
+    assert menu_snapshot.get_default_menu_document(2, "lunch", today) is None
+
+
+def test_rows_handed_out_are_copies(tmp_path):
+    store = seeded_store(tmp_path)
+    today = get_today_est()
+    publish_snapshot(store.export_menus(today), tmp_path / "snapshot")
+    menu_snapshot = get_menu_snapshot(tmp_path / "snapshot")
+
+    menu_snapshot.fetch_menu_items(1, "lunch", today)[0]["station"] = "changed"
+    assert menu_snapshot.fetch_menu_items(1, "lunch", today)[0]["station"] == "Grill"
+
+
+def test_readers_switch_to_a_newer_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_CHECK_INTERVAL", 0)
+    today = get_today_est()
+    first = publish_snapshot(seeded_store(tmp_path / "a").export_menus(today), tmp_path / "snapshot")
+    assert get_menu_snapshot(tmp_path / "snapshot").get_loaded_menu(1, today)["version"] == "v1"
+
+    second = publish_snapshot(seeded_store(tmp_path / "b", "v2").export_menus(today), tmp_path / "snapshot")
+    assert second == first + 1
+    assert get_menu_snapshot(tmp_path / "snapshot").get_loaded_menu(1, today)["version"] == "v2"
+
+
+def test_fresh_snapshot_menus_are_served_without_the_store(tmp_path, monkeypatch):
+    store = seeded_store(tmp_path)
+    today = get_today_est()
+    monkeypatch.setattr(snapshot, "SNAPSHOT_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(query, "get_menu_snapshot", lambda: get_menu_snapshot(tmp_path / "snapshot"))
+    publish_snapshot(store.export_menus(today), tmp_path / "snapshot")
+
+    def no_store():
+        raise AssertionError("the local store should not be read")
+    monkeypatch.setattr(query, "get_menu_store", no_store)
+
+    reader = query.sync_hall_menu(1, today)
+    assert isinstance(reader, snapshot.MenuSnapshot)
+    assert [item["name"] for item in reader.fetch_menu_items(1, "lunch", today, ["Vegetarian"])] == ["Toast", "Eggs", "Rice"]
+
+
+def test_stale_snapshots_fall_back_to_the_store(tmp_path, monkeypatch):
+    today = get_today_est()
+    monkeypatch.setattr(snapshot, "SNAPSHOT_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(query, "get_menu_snapshot", lambda: get_menu_snapshot(tmp_path / "snapshot"))
+    menus = seeded_store(tmp_path / "old").export_menus(today)
+    menus[0]["loaded_at"] -= query.MENU_STORE_TTL + 1
+    publish_snapshot(menus, tmp_path / "snapshot")
+
+    # The store has since loaded a newer version the snapshot doesn't hold yet
+    store = seeded_store(tmp_path / "new", "v2")
+    monkeypatch.setattr(query, "get_menu_store", lambda: store)
+    assert query.sync_hall_menu(1, today) is store
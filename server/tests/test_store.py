@@ -0,0 +1,55 @@
+import sqlite3
+
+from app.store import MenuStore
+from app.utils import get_retention_cutoff, get_today_est
+
+
+def row(name, item_id=None, meal_period="lunch", convenience_score=1):
+    menu_row = {"name": name, "meal_period": meal_period, "convenience_score": convenience_score, "traits": [], "allergens": []}
+    if item_id is not None:
+        menu_row["id"] = item_id
+    return menu_row
+
+
+def test_upstream_ids_are_kept(tmp_path):
+    store = MenuStore(tmp_path / "menu.sqlite3")
+    today = get_today_est()
+    store.replace_hall_menu([row("Toast", 905), row("Eggs", 17)], 1, today, "v1")
+    # Another hall reusing an id must not collide with the first one
+    store.replace_hall_menu([row("Rice", 905)], 2, today, "v1")
+
+    assert [(item["id"], item["name"]) for item in store.fetch_menu_items(1, "lunch", today)] == [(17, "Eggs"), (905, "Toast")]
+    assert [item["id"] for item in store.fetch_menu_items(2, "lunch", today)] == [905]
+
+
+def test_rows_without_ids_are_numbered_within_the_menu(tmp_path):
+    store = MenuStore(tmp_path / "menu.sqlite3")
+    today = get_today_est()
+    store.replace_hall_menu([row("Toast", 4), row("Eggs"), row("Tots")], 1, today)
+
+    assert [(item["id"], item["name"]) for item in store.fetch_menu_items(1, "lunch", today)] == [(4, "Toast"), (5, "Eggs"), (6, "Tots")]
+
+
+def test_menus_before_the_retention_cutoff_are_pruned(tmp_path):
+    store = MenuStore(tmp_path / "menu.sqlite3")
+    old_date = "2000-01-01"
+    store.replace_hall_menu([row("Toast", 1)], 1, old_date, "old")
+    store.replace_hall_menu([row("Eggs", 2)], 1, get_retention_cutoff(), "kept")
+    store.replace_hall_menu([row("Rice", 3)], 1, get_today_est(), "v1")
+
+    assert store.get_loaded_menu(1, old_date) is None
+    assert store.fetch_menu_items(1, "lunch", old_date) == []
+    assert store.get_default_menu_document(1, "lunch", old_date) == b"[]"
+    assert store.get_loaded_menu(1, get_retention_cutoff())["version"] == "kept"
+
+
+def test_stores_with_an_older_schema_are_rebuilt(tmp_path):
+    path = tmp_path / "menu.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE menu_items (id INTEGER PRIMARY KEY, date TEXT, data TEXT)")
+        conn.execute("INSERT INTO menu_items VALUES (1, '2026-01-01', '{}')")
+
+    store = MenuStore(path)
+    store.replace_hall_menu([row("Toast", 1)], 1, get_today_est(), "v1")
+
+    assert [item["name"] for item in store.fetch_menu_items(1, "lunch", get_today_est())] == ["Toast"]